@@ -1,21 +1,85 @@
 from PIL import Image, ImageDraw, ImageFont
-import ffmpeg
 from math_helpers import lerp
 from typing import Callable, Union
-from time import time, sleep
+from time import time, sleep, perf_counter_ns
 from os import mkdir, remove
 from shutil import rmtree
-from pydub import AudioSegment
+import numpy as np
+import wave
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future
+from functools import lru_cache
+from importlib import import_module
+from glyph_atlas import glyph_atlas, load_glyph_atlas
+from render_cache import RenderCache, hash_file, hash_content
+from profiling import profiler, profiled
+from numpy_compositor import (
+    numpy_compositor,
+    DirtyRegionCompositor,
+    PremultipliedFrame,
+    blend_frame,
+    blend_fill,
+    clip_region,
+    clip_buffer,
+    draw_with_pillow,
+    union_rects,
+)
+
+# Bump whenever the meaning of cached renders changes in a way the
+# renderer's source hash (see `get_renderer_hash`) doesn't catch
+RENDER_CACHE_VERSION = 2
+
+# Modules whose code decides what a render looks like, besides the
+# director's own module
+RENDERER_MODULES = (
+    "MovieKit",
+    "glyph_atlas",
+    "numpy_compositor",
+    "font_tools",
+    "font_constants",
+    "parse_tags",
+    "timeline",
+    "math_helpers",
+)
+
+@lru_cache(maxsize=None)
+def get_renderer_hash(director_module: str) -> str:
+    """
+    Hash of the renderer's source files and the versions of the libraries
+    that draw and encode frames, so a change to any of them never reuses
+    renders made before it.
+    """
+    import PIL
+    sources = {}
+    for name in sorted(set(RENDERER_MODULES) | {director_module}):
+        path = getattr(import_module(name), "__file__", None)
+        sources[name] = None if path is None else hash_file(path)
+    return hash_content({"sources": sources, "pillow": PIL.__version__, "numpy": np.__version__})
 
 class Scene:
     w: int = 0
     h: int = 0
     __root: 'SceneObject' = None
 
-    def __init__(self, w: int = 0, h: int = 0, root: 'SceneObject' = None):
+    def __init__(self, w: int = 0, h: int = 0, root: 'SceneObject' = None, compositor: str = "pillow", dirty_regions: bool = False):
         self.w = w
         self.h = h
+        # "pillow" composites with Image.paste, "numpy" with array blending
+        # into a reused frame buffer. Both give identical frames.
+        if compositor not in COMPOSITORS:
+            raise Exception(f"Unknown compositor \"{compositor}\", expected one of {COMPOSITORS}")
+        self.compositor = compositor
+        # With the NumPy compositor, only the parts of the previous frame
+        # that changed are composited again. Compositing worker processes
+        # each compare against the last frame they composited
+        if dirty_regions and compositor != "numpy":
+            raise Exception("Dirty region compositing needs the numpy compositor")
+        self.dirty_regions = dirty_regions
+        self.dirty_region_compositor = DirtyRegionCompositor()
+        self.snapshot_keys: list[int] = []
         self.__done = False
+        self.__objects: list[SceneObject] = None
+        self.__render_list: list[SceneObject] = None
         self.set_root(root)
 
     def set_root(self, root: 'SceneObject'):
@@ -24,21 +88,73 @@ class Scene:
         self.__root = root
         if self.__root is not None:
             self.__root.make_root(self)
+        self.invalidate_object_list()
+
+    def invalidate_object_list(self):
+        self.__objects = None
+        self.__render_list = None
+
+    def get_object_list(self) -> list['SceneObject']:
+        """
+        Every object below the root, in hierarchy order. Rebuilt only after the
+        hierarchy changes.
+        """
+        if self.__objects is None:
+            self.__objects = self.__root.get_self_and_children_as_flat_list() if self.__root is not None else []
+        return self.__objects
+
+    def get_render_list(self) -> list['SceneObject']:
+        """
+        `get_object_list` sorted by z. Rebuilt only after the hierarchy or an
+        object's z changes.
+        """
+        if self.__render_list is None:
+            render_list = sorted(self.get_object_list(), key=lambda obj: obj.z)
+            for object_type in {type(object) for object in render_list}:
+                check_render_override(object_type)
+            self.__render_list = render_list
+        return self.__render_list
+
+    def get_render_snapshot(self) -> list[tuple[type, tuple]]:
+        """
+        Captures what every visible object would draw this frame as a list of
+        picklable `(object type, render state)` pairs in z order, so the frame
+        can be composited later or in another process.
+        """
+        snapshot = []
+        self.snapshot_keys = []
+        for object in self.get_render_list():
+            if object.get_absolute_visibility() and self.is_on_screen(object):
+                state = object.get_render_state()
+                if state is not None:
+                    snapshot.append((type(object), state))
+                    self.snapshot_keys.append(id(object))
+        return snapshot
+
+    def is_on_screen(self, object: 'SceneObject') -> bool:
+        bounds = object.get_bounds()
+        if bounds is None:
+            return True
+        left, top, right, bottom = bounds
+        return right > 0 and bottom > 0 and left < self.w and top < self.h
+
+    def composite(self, snapshot: list[tuple[type, tuple]]) -> Image.Image:
+        """
+        Composites the snapshot most recently returned by
+        `get_render_snapshot` in this process.
+        """
+        if self.dirty_regions:
+            return self.dirty_region_compositor.render(self.w, self.h, self.snapshot_keys, snapshot)
+        return render_snapshot(self.w, self.h, snapshot, self.compositor)
+
+    def render_frame(self) -> Image.Image:
+        return self.composite(self.get_render_snapshot())
 
     def render(self, path: str):
-        img = Image.new("RGBA", (self.w, self.h))
-        ctx = ImageDraw.ImageDraw(img)
-
-        all_objects: list[SceneObject] = sorted(self.__root.get_self_and_children_as_flat_list(), key=lambda obj: obj.z)
-
-        for object in all_objects:
-            if object.get_absolute_visibility():
-                object.render(img, ctx)
-
-        img.save(path)
+        self.render_frame().save(path)
 
     def update(self, delta: float):
-        for object in self.__root.get_self_and_children_as_flat_list():
+        for object in self.get_object_list():
             object.update(delta)
 
     def set_animation_done(self):
@@ -50,19 +166,87 @@ class Scene:
     def receive_message(self, data):
         ...
 
+COMPOSITORS = ("pillow", "numpy")
+
+def render_snapshot(w: int, h: int, snapshot: list[tuple[type, tuple]], compositor: str = "pillow") -> Image.Image:
+    if compositor == "numpy":
+        buffer = numpy_compositor.get_buffer(w, h)
+        draw = lambda object_type, state: numpy_compositor.draw(object_type, state, buffer)
+    else:
+        img = Image.new("RGBA", (w, h))
+        ctx = ImageDraw.ImageDraw(img)
+        draw = lambda object_type, state: object_type.draw_render_state(state, img, ctx)
+
+    if profiler.enabled:
+        # Timed per object type, without trace events since there are so many
+        for object_type, state in snapshot:
+            start = perf_counter_ns()
+            draw(object_type, state)
+            profiler.add_time(f"draw {object_type.__name__}", "draw", perf_counter_ns() - start)
+        profiler.count("objects drawn", len(snapshot))
+    else:
+        for object_type, state in snapshot:
+            draw(object_type, state)
+    return numpy_compositor.to_image(buffer) if compositor == "numpy" else img
+
+# Each compositing worker process keeps its own, and only composites again
+# what changed since the last frame that worker was given
+worker_dirty_region_compositor = DirtyRegionCompositor()
+
+def composite_in_worker(w: int, h: int, keys: list[int], snapshot: list[tuple[type, tuple]], compositor: str, dirty_regions: bool) -> Image.Image:
+    if dirty_regions:
+        return worker_dirty_region_compositor.render(w, h, keys, snapshot)
+    return render_snapshot(w, h, snapshot, compositor)
+
+@lru_cache(maxsize=None)
+def load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(path, size)
+
+def get_font_key(font: ImageFont.FreeTypeFont) -> tuple[str, int] | None:
+    return None if font is None else (font.path, font.size)
+
+def get_font_from_key(font_key: tuple[str, int] | None) -> ImageFont.FreeTypeFont | None:
+    return None if font_key is None else load_font(*font_key)
+
+@lru_cache(maxsize=None)
+def check_render_override(object_type: type):
+    """
+    Raises if `object_type` overrides `render` more recently than
+    `get_render_state`, since scenes never call `render` and its drawing
+    would silently go missing.
+    """
+    def get_defining_class(name: str) -> type:
+        return next(cls for cls in object_type.__mro__ if name in vars(cls))
+    render_class = get_defining_class("render")
+    state_class = get_defining_class("get_render_state")
+    if render_class is not state_class and issubclass(render_class, state_class):
+        raise Exception(f"{object_type.__name__} overrides render(), which scenes no longer call. Implement get_render_state() and draw_render_state() instead")
+
 class SceneObject:
-    x: int = 0
-    y: int = 0
-    z: int = 0
+    """
+    Something in a scene. To draw, a subclass returns a picklable tuple from
+    `get_render_state` and draws it in the static `draw_render_state`, which
+    may run in another process; `draw_render_state_array` can be added for
+    the numpy compositor. Scenes don't call `render`, so overriding it alone
+    raises an error when the object is first rendered.
+    """
+    _x: int = 0
+    _y: int = 0
+    _z: int = 0
     name: str = ""
-    visible: bool = True
+    _visible: bool = True
     __children: list['SceneObject'] = []
     __parent: Union['SceneObject', Scene] = None
 
+    # Cached ((absolute x, y, z), absolute visibility), or None if it needs
+    # to be recalculated. If an object's cache is valid, so are the caches of
+    # all of its ancestors.
+    __absolute_state: tuple[tuple[int, int, int], bool] = None
+
     def __init__(self, parent: 'SceneObject' = None, name: str = "", pos: tuple[int, int, int] = (0,0,0)):
+        self.__children = []
         self.x, self.y, self.z = pos
         self.name = name
-        self.__children = []
 
         if isinstance(parent, Scene):
             parent.set_root(self)
@@ -74,11 +258,101 @@ class SceneObject:
         return type(self).__name__ + f" \"{self.name}\" ({self.x}, {self.y}, {self.z})"
 
     def render(self, img: Image.Image, ctx: ImageDraw.ImageDraw):
+        state = self.get_render_state()
+        if state is not None:
+            self.draw_render_state(state, img, ctx)
+
+    def get_render_state(self) -> tuple | None:
+        """
+        Returns a picklable tuple with everything `draw_render_state` needs to
+        draw this object, or None if there is nothing to draw.
+        """
+        return None
+
+    @staticmethod
+    def draw_render_state(state: tuple, img: Image.Image, ctx: ImageDraw.ImageDraw):
         pass
 
+    @staticmethod
+    def get_render_state_bounds(state: tuple) -> tuple[int, int, int, int] | None:
+        """
+        Returns the `(left, top, right, bottom)` rectangle drawing `state`
+        can change, or None if it isn't known.
+        """
+        return None
+
+    @classmethod
+    def get_render_state_change_bounds(cls, old_state: tuple, new_state: tuple) -> tuple[int, int, int, int] | None:
+        """
+        Returns a rectangle covering every pixel that can differ between
+        drawing `old_state` and drawing `new_state`, or None if it isn't known.
+        """
+        old_bounds = cls.get_render_state_bounds(old_state)
+        new_bounds = cls.get_render_state_bounds(new_state)
+        if old_bounds is None or new_bounds is None:
+            return None
+        return union_rects(old_bounds, new_bounds)
+
+    def get_state_data(self) -> list:
+        """
+        JSON-serializable description of everything about this object that
+        can affect how future frames look, used to tell whether two points in
+        different renders will play out the same.
+        """
+        return [type(self).__name__, self.name, self.x, self.y, self.z, self.visible]
+
+    def get_bounds(self) -> tuple[int, int, int, int] | None:
+        """
+        Returns the absolute `(left, top, right, bottom)` rectangle this object
+        draws into, or None if it isn't known. Objects whose bounds are outside
+        the canvas are skipped when rendering.
+        """
+        return None
+
     def update(self, delta):
         pass
 
+    @property
+    def x(self) -> int:
+        return self._x
+
+    @x.setter
+    def x(self, x: int):
+        if x != self._x:
+            self._x = x
+            self.invalidate_absolute_state()
+
+    @property
+    def y(self) -> int:
+        return self._y
+
+    @y.setter
+    def y(self, y: int):
+        if y != self._y:
+            self._y = y
+            self.invalidate_absolute_state()
+
+    @property
+    def z(self) -> int:
+        return self._z
+
+    @z.setter
+    def z(self, z: int):
+        if z != self._z:
+            self._z = z
+            self.invalidate_absolute_state()
+            self.invalidate_scene_order()
+
+    @property
+    def visible(self) -> bool:
+        return self._visible
+
+    @visible.setter
+    def visible(self, visible: bool):
+        if visible != self._visible:
+            self._visible = visible
+            self.invalidate_absolute_state()
+
     def get_x(self) -> int:
         return self.x
 
@@ -99,32 +373,50 @@ class SceneObject:
 
     def make_root(self, scene: Scene):
         self.__parent = scene
+        self.invalidate_absolute_state()
 
     def add_child(self, new_child: 'SceneObject'):
+        new_child.invalidate_scene_order()
         self.__children.append(new_child)
         if new_child.__parent is not None:
             new_child.__parent.__children.remove(new_child)
         new_child.__parent = self
+        new_child.invalidate_absolute_state()
+        self.invalidate_scene_order()
 
-    def get_absolute_position(self) -> tuple[int, int, int]:
+    def get_scene(self) -> Scene | None:
         p = self
-        x_out = 0
-        y_out = 0
-        z_out = 0
-        while p is not None and not isinstance(p, Scene):
-            x_out += p.x
-            y_out += p.y
-            z_out += p.z
+        while isinstance(p, SceneObject):
             p = p.__parent
-        return (x_out, y_out, z_out)
+        return p
+
+    def invalidate_scene_order(self):
+        scene = self.get_scene()
+        if scene is not None:
+            scene.invalidate_object_list()
+
+    def invalidate_absolute_state(self):
+        # Descendants of an object with no cached state can't have one either
+        if self.__absolute_state is None:
+            return
+        self.__absolute_state = None
+        for child in self.__children:
+            child.invalidate_absolute_state()
+
+    def get_absolute_state(self) -> tuple[tuple[int, int, int], bool]:
+        if self.__absolute_state is None:
+            if isinstance(self.__parent, SceneObject):
+                (x, y, z), visible = self.__parent.get_absolute_state()
+            else:
+                (x, y, z), visible = (0, 0, 0), True
+            self.__absolute_state = ((x + self._x, y + self._y, z + self._z), visible and self._visible)
+        return self.__absolute_state
+
+    def get_absolute_position(self) -> tuple[int, int, int]:
+        return self.get_absolute_state()[0]
 
     def get_absolute_visibility(self) -> bool:
-        p = self
-        while p is not None and not isinstance(p, Scene):
-            if not p.visible:
-                return False
-            p = p.__parent
-        return True
+        return self.get_absolute_state()[1]
 
     def print_hierarchy(self):
         self.__internal_print_hierarchy(0)
@@ -151,6 +443,59 @@ class SceneObject:
         else:
             print(f"Error in emit_audio - parent of {self} is type {type(self.__parent)}")
 
+class ImageAssetCache:
+    """
+    Process-wide cache of decoded images, bounded by the total size of the
+    decoded RGBA data and evicted least-recently-used first. Cached frames
+    are shared between every ImageObject using the same file, so they must
+    not be modified.
+    """
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.__entries: OrderedDict[str, tuple] = OrderedDict()
+
+    def get(self, filepath: str) -> tuple[Image.Image | tuple[tuple[Image.Image, float], ...], float | None]:
+        entry = self.__entries.get(filepath)
+        if entry is not None:
+            self.hits += 1
+            self.__entries.move_to_end(filepath)
+            return entry[0], entry[1]
+
+        self.misses += 1
+        image_data, duration, size = self.load(filepath)
+        self.__entries[filepath] = (image_data, duration, size)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes and len(self.__entries) > 1:
+            _, (_, _, evicted_size) = self.__entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+        return image_data, duration
+
+    def load(self, filepath: str):
+        with Image.open(filepath) as my_img:
+            if getattr(my_img, "is_animated", False):
+                frames = []
+                size = 0
+                time_so_far = 0.0
+                for frame_no in range(my_img.n_frames):
+                    my_img.seek(frame_no)
+                    time_so_far += my_img.info['duration'] / 1000
+                    frame = my_img.convert('RGBA')
+                    size += frame.width * frame.height * 4
+                    frames.append((frame, time_so_far))
+                return tuple(frames), time_so_far, size
+            else:
+                image = my_img.convert('RGBA')
+                return image, None, image.width * image.height * 4
+
+    def clear(self):
+        self.__entries.clear()
+        self.current_bytes = 0
+
+image_cache = ImageAssetCache()
+
 class ImageObject(SceneObject):
     filepath: str = ""
     t: float = 0.0
@@ -158,7 +503,8 @@ class ImageObject(SceneObject):
     width: int = None
     height: int = None
 
-    image_data: Image.Image | list[tuple[Image.Image, float]] = []
+    image_data: Image.Image | tuple[tuple[Image.Image, float], ...] = None
+    image_duration: float | None = None
 
     current_frame: Image = None
     callbacks: dict = {}
@@ -186,45 +532,161 @@ class ImageObject(SceneObject):
         self.filepath = filepath
         if self.filepath is None:
             self.image_data = None
+            self.image_duration = None
             return
-        with Image.open(self.filepath) as my_img:
-            if my_img.is_animated:
-                self.image_data = []
-                time_so_far = 0.0
-                for frame_no in range(my_img.n_frames):
-                    my_img.seek(frame_no)
-                    time_so_far += my_img.info['duration'] / 1000
-                    self.image_data.append((
-                        my_img.convert('RGBA'),
-                        time_so_far
-                    ))
-                self.image_duration = time_so_far
-            else:
-                self.image_data = my_img.convert('RGBA')
-                self.image_duration = None
+        self.image_data, self.image_duration = image_cache.get(self.filepath)
 
-    def get_current_frame(self):
+    def get_current_frame_index(self):
         t = self.t % self.image_duration
-        for image, max_time in self.image_data:
+        for i, (_, max_time) in enumerate(self.image_data):
             if max_time > t:
-                return image
+                return i
         return None
 
-    def render(self, img: Image.Image, ctx: ImageDraw.ImageDraw):
+    def get_current_frame(self):
+        i = self.get_current_frame_index()
+        return None if i is None else self.image_data[i][0]
+
+    def get_state_data(self):
+        callbacks = []
+        for time, callback in sorted(self.callbacks.items(), key=lambda item: item[0]):
+            if time <= self.t or callback is None:
+                # Already called, or never will be
+                continue
+            # Values a callback closes over (like the sprite to switch back
+            # to) decide what it will do, so they are part of the state too
+            cells = callback.__closure__ or ()
+            callbacks.append([time, callback.__qualname__] + [cell.cell_contents for cell in cells if isinstance(cell.cell_contents, (str, int, float))])
+
+        # Time only matters for callbacks still to come and for where an
+        # animation is in its loop, so an image reached at a different point
+        # in the movie still has the same state
+        if len(callbacks) > 0:
+            t = self.t
+        elif self.image_duration is not None:
+            t = round(self.t % self.image_duration, 6)
+        else:
+            t = None
+        return super().get_state_data() + [self.filepath, t, self.width, self.height, callbacks]
+
+    def get_size(self) -> tuple[int, int]:
+        frame = self.image_data if isinstance(self.image_data, Image.Image) else self.image_data[0][0]
+        w = frame.width if self.width is None else self.width
+        h = frame.height if self.height is None else self.height
+        return (w, h)
+
+    def get_bounds(self):
         if self.image_data is None:
-            return
+            return None
+        x, y, _ = self.get_absolute_position()
+        w, h = self.get_size()
+        return (x, y, x + w, y + h)
+
+    def get_render_state(self):
+        if self.image_data is None:
+            return None
+        frame_index = None
+        if isinstance(self.image_data, tuple):
+            frame_index = self.get_current_frame_index()
+            if frame_index is None:
+                return None
         x, y, _ = self.get_absolute_position()
-        box = (x, y)
-        if isinstance(self.image_data, Image.Image):
-            w = self.image_data.width if self.width is None else self.width
-            h = self.image_data.height if self.height is None else self.height
-            resized = self.image_data.resize((w, h))
-        elif isinstance(self.image_data, list):
-            current_frame = self.get_current_frame()
-            w = current_frame.width if self.width is None else self.width
-            h = current_frame.height if self.height is None else self.height
-            resized = current_frame.resize((w, h))
-        img.paste(resized, box, mask=resized)
+        return (self.filepath, frame_index, x, y, self.width, self.height)
+
+    @staticmethod
+    def draw_render_state(state: tuple, img: Image.Image, ctx: ImageDraw.ImageDraw):
+        filepath, frame_index, x, y, width, height = state
+        resized = get_sized_frame(filepath, frame_index, width, height)
+        img.paste(resized, (x, y), mask=resized)
+
+    @staticmethod
+    def draw_render_state_array(state: tuple, buffer: np.ndarray, clip: tuple[int, int, int, int] = None):
+        filepath, frame_index, x, y, width, height = state
+        view, left, top = clip_buffer(buffer, clip)
+        blend_frame(view, x - left, y - top, get_premultiplied_frame(filepath, frame_index, width, height))
+
+    @staticmethod
+    def get_render_state_bounds(state: tuple):
+        filepath, frame_index, x, y, width, height = state
+        frame = get_premultiplied_frame(filepath, frame_index, width, height)
+        left, top = x + frame.offset[0], y + frame.offset[1]
+        return (left, top, left + frame.rgba.shape[1], top + frame.rgba.shape[0])
+
+    @classmethod
+    def get_render_state_change_bounds(cls, old_state: tuple, new_state: tuple):
+        filepath, old_frame_index, x, y, width, height = old_state
+        if old_frame_index != new_state[1] and (filepath, x, y, width, height) == new_state[:1] + new_state[2:]:
+            # Only the animation frame changed, so only where the frames differ
+            left, top, right, bottom = get_frame_difference_bounds(filepath, old_frame_index, new_state[1], width, height)
+            return (x + left, y + top, x + right, y + bottom)
+        return super().get_render_state_change_bounds(old_state, new_state)
+
+def get_frame(filepath: str, frame_index: int | None) -> Image.Image:
+    image_data, _ = image_cache.get(filepath)
+    return image_data if frame_index is None else image_data[frame_index][0]
+
+def get_sized_frame(filepath: str, frame_index: int | None, width: int | None, height: int | None) -> Image.Image:
+    current_frame = get_frame(filepath, frame_index)
+    w = current_frame.width if width is None else width
+    h = current_frame.height if height is None else height
+    if (w, h) == current_frame.size:
+        # No explicit size, or it matches the source - draw the cached frame as is
+        return current_frame
+    return get_resized_frame(filepath, frame_index, w, h)
+
+@lru_cache(maxsize=256)
+def get_resized_frame(filepath: str, frame_index: int | None, w: int, h: int) -> Image.Image:
+    """
+    Resized copy of a frame from `image_cache`. Keyed by the target size, so
+    an object whose size changes back and forth reuses earlier copies.
+    """
+    return get_frame(filepath, frame_index).resize((w, h))
+
+@lru_cache(maxsize=256)
+def get_premultiplied_frame(filepath: str, frame_index: int | None, width: int | None, height: int | None) -> PremultipliedFrame:
+    return PremultipliedFrame(get_sized_frame(filepath, frame_index, width, height))
+
+@lru_cache(maxsize=1024)
+def get_frame_difference_bounds(filepath: str, frame_index: int, other_frame_index: int, width: int | None, height: int | None) -> tuple[int, int, int, int]:
+    """
+    Bounding box of the pixels that differ between two frames of the same
+    image, relative to its top left corner.
+    """
+    frame = np.asarray(get_sized_frame(filepath, frame_index, width, height))
+    other_frame = np.asarray(get_sized_frame(filepath, other_frame_index, width, height))
+    if frame.shape != other_frame.shape:
+        return (0, 0, max(frame.shape[1], other_frame.shape[1]), max(frame.shape[0], other_frame.shape[0]))
+    rows, columns = np.nonzero((frame != other_frame).any(axis=2))
+    if len(rows) == 0:
+        return (0, 0, 0, 0)
+    return (int(columns.min()), int(rows.min()), int(columns.max()) + 1, int(rows.max()) + 1)
+
+MIX_FRAME_RATE = 44100
+MIX_CHANNELS = 2
+
+def ms_to_audio_frames(ms: int) -> int:
+    return ms * MIX_FRAME_RATE // 1000
+
+# Bounded, since each decoded sound is kept whole
+@lru_cache(maxsize=32)
+def decode_audio(path: str) -> np.ndarray:
+    """
+    Decodes `path` into 16-bit PCM at the mixer's frame rate, shaped
+    (frames, channels). The returned array is shared, so it is read-only.
+    """
+    from pydub import AudioSegment
+    segment = AudioSegment.from_file(path).set_frame_rate(MIX_FRAME_RATE).set_channels(MIX_CHANNELS).set_sample_width(2)
+    return np.frombuffer(segment.raw_data, dtype=np.int16).reshape(-1, MIX_CHANNELS)
+
+def load_audio_samples(path: str, trailing_silence: int = 0) -> np.ndarray:
+    """
+    The samples of `path` followed by `trailing_silence` ms of silence. The
+    file is only decoded once however many different silences follow it.
+    """
+    samples = decode_audio(path)
+    if trailing_silence > 0:
+        samples = np.concatenate([samples, np.zeros((ms_to_audio_frames(trailing_silence), MIX_CHANNELS), dtype=np.int16)])
+    return samples
 
 class SimpleTextObject(SceneObject):
     def __init__(self, parent: 'SceneObject' = None, name: str = "", pos: tuple[int, int, int] = (0,0,0), \
@@ -233,26 +695,89 @@ class SimpleTextObject(SceneObject):
         self.text = text
         self.font = font
 
+    def get_state_data(self):
+        return super().get_state_data() + [self.text, get_font_key(self.font)]
+
     def get_width(self):
         if self.font is not None:
             return self.font.getlength(self.text)
 
-    def render(self, img: Image.Image, ctx: ImageDraw.ImageDraw):
+    def get_render_state(self):
         x, y, _ = self.get_absolute_position()
+        return (x, y, self.text, get_font_key(self.font))
+
+    @staticmethod
+    def draw_render_state(state: tuple, img: Image.Image, ctx: ImageDraw.ImageDraw):
+        x, y, text, font_key = state
 
         args = {
             "xy": (x,y),
-            "text": self.text,
+            "text": text,
             "fill": (255,255,255)
         }
 
-        if self.font is not None:
-            args["font"] = self.font
-        ctx.text(**args)
+        if font_key is None:
+            ctx.text(**args)
+        else:
+            glyph_atlas.draw_text(img, font=get_font_from_key(font_key), **args)
+
+    @staticmethod
+    def draw_render_state_array(state: tuple, buffer: np.ndarray, clip: tuple[int, int, int, int] = None):
+        x, y, text, font_key = state
+        if font_key is None:
+            # Pillow's default font isn't in the glyph atlas
+            draw_with_pillow(SimpleTextObject, state, buffer, clip)
+            return
+        mask, left, top = get_text_mask((x, y), text, font_key)
+        if mask is None:
+            return
+        buffer, clip_left, clip_top = clip_buffer(buffer, clip)
+        region = clip_region(buffer, left - clip_left, top - clip_top, mask.shape[1], mask.shape[0])
+        if region is None:
+            return
+        dst, _ = region
+        # Text usually sits on the same background every frame (like a name
+        # tag), so the blended result is reused when what's under it matches
+        key = (x, y, text, font_key, clip_left, clip_top, buffer.shape, buffer[dst].tobytes())
+        blended = text_blend_results.get(key)
+        if blended is None:
+            blend_fill(buffer, left - clip_left, top - clip_top, mask, (255, 255, 255))
+            if len(text_blend_results) >= 64:
+                text_blend_results.clear()
+            text_blend_results[key] = buffer[dst].copy()
+        else:
+            buffer[dst] = blended
+
+    @staticmethod
+    def get_render_state_bounds(state: tuple):
+        x, y, text, font_key = state
+        if font_key is None:
+            return None
+        mask, left, top = get_text_mask((x, y), text, font_key)
+        if mask is None:
+            return (x, y, x, y)
+        return (left, top, left + mask.shape[1], top + mask.shape[0])
+
+text_blend_results: dict[tuple, np.ndarray] = {}
+
+@lru_cache(maxsize=256)
+def get_text_mask(xy: tuple[int, int], text: str, font_key: tuple[str, int]) -> tuple[np.ndarray | None, int, int]:
+    """
+    The combined glyph mask of `text` as an array, and where its top left
+    corner goes. The mask is None if the text has no ink.
+    """
+    mask, (left, top, _, _) = glyph_atlas.get_text_mask(xy, text, get_font_from_key(font_key))
+    return None if mask is None else np.asarray(mask), left, top
 
 class Sequencer:
     actions: list['SequenceAction'] = []
 
+    def __init__(self):
+        self.actions = []
+
+    def get_state_data(self) -> list:
+        return [action.get_state_data() for action in self.actions if not action.completed]
+
     def run_action(self, action: 'SequenceAction'):
         self.actions.append(action)
         action.sequencer = self
@@ -273,6 +798,9 @@ class SequenceAction:
     def update(self, delta):
         ...
 
+    def get_state_data(self) -> list:
+        return [type(self).__name__]
+
 class MoveSceneObjectAction(SequenceAction):
     target_value: tuple[int, int] = (0,0)
     duration: float = 0.0
@@ -297,6 +825,15 @@ class MoveSceneObjectAction(SequenceAction):
             self.ease_function = ease_function
         self.on_complete = on_complete_function
 
+    def get_state_data(self):
+        return super().get_state_data() + [
+            self.target_value,
+            self.duration,
+            self.scene_object.name,
+            self.time_passed,
+            getattr(self, "initial_value", None),
+        ]
+
     def update(self, delta):
         if self.time_passed == 0:
             self.initial_value = (self.scene_object.x, self.scene_object.y)
@@ -315,6 +852,54 @@ class MoveSceneObjectAction(SequenceAction):
             if self.on_complete is not None:
                 self.on_complete()
 
+# Frames each PNG writer thread may have queued before the render loop waits
+FRAMES_QUEUED_PER_WRITER = 2
+
+class FrameWriter:
+    """
+    Saves frames from a pool of threads, so PNG compression (which releases
+    the GIL) overlaps updating and compositing the frames after it. At most
+    `writers * FRAMES_QUEUED_PER_WRITER` frames are waiting to be written;
+    `save` blocks until the oldest is done once that many are, so memory
+    stays bounded however long the movie is.
+
+    Images handed to `save` must not be changed afterwards. Errors from a
+    save are raised by a later `save` or by `close`.
+    """
+    def __init__(self, writers: int = 2):
+        self.executor = ThreadPoolExecutor(max(writers, 1), thread_name_prefix="FrameWriter")
+        self.max_pending = max(writers, 1) * FRAMES_QUEUED_PER_WRITER
+        self.pending: deque[Future] = deque()
+
+    def save(self, img: Image.Image, path: str):
+        if len(self.pending) >= self.max_pending:
+            with profiler.span("wait for PNG writer"):
+                self.pending.popleft().result()
+        self.pending.append(self.executor.submit(save_frame, img, path))
+
+    def close(self):
+        """
+        Waits for every queued frame to be written.
+        """
+        try:
+            with profiler.span("wait for PNG writer"):
+                while len(self.pending) > 0:
+                    self.pending.popleft().result()
+        finally:
+            for future in self.pending:
+                future.cancel()
+            self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def save_frame(img: Image.Image, path: str):
+    with profiler.span("PNG save"):
+        img.save(path)
+
 class Director:
     def __init__(self, scene: Scene = None, fps: float = 30):
         self.sequencer = Sequencer()
@@ -322,69 +907,551 @@ class Director:
         self.fps = fps
         self.audio_commands: list[dict] = []
         self.time = 0.0
+        self.is_done = False
 
     def update(self, delta: float):
         ...
 
-    def render_audio(self, overall_duration, output_location, volume_adjustment: float = 0.0):
-        duration_ms = int(overall_duration * 1000)
-        base_track = AudioSegment.silent(duration=duration_ms)
+    def get_planned_frame_count(self) -> int | None:
+        """
+        Number of frames the movie will have, if it and every audio cue are
+        known before rendering, so the audio can be mixed while frames are
+        rendered. None otherwise.
+        """
+        return None
 
-        for audio in self.audio_commands:
+    @profiled("render_audio")
+    def render_audio(self, overall_duration, output_location, volume_adjustment: float = 0.0, audio_commands: list[dict] = None) -> str:
+        """
+        Mixes the audio cues (`audio_commands` if given, otherwise the
+        director's) into a 16-bit PCM WAV and returns its location. It is
+        left uncompressed so the only lossy encode is the final AAC one.
+        """
+        total_frames = ms_to_audio_frames(int(overall_duration * 1000))
+        mix = np.zeros((total_frames, MIX_CHANNELS), dtype=np.int32)
+
+        for audio in self.audio_commands if audio_commands is None else audio_commands:
             path = audio["path"]
             offset = int(audio.get("offset", 0.0) * 1000)
             loop_type = audio.get("loop_type", "no_loop")
             loop_delay = int(audio.get("loop_delay", 0) * 1000)
-            end_time = audio.get("end", duration_ms)
+            end_time = audio.get("end", overall_duration)
 
-            # Segment with silence afterwards
-            new_segment = AudioSegment.from_file(path) + AudioSegment.silent(duration=loop_delay)
+            # Samples with silence afterwards
+            samples = load_audio_samples(path, loop_delay)
+            start = ms_to_audio_frames(offset)
+            if len(samples) == 0 or start >= total_frames:
+                continue
 
             # The segment should be this long
-            duration_of_total_segment = int(end_time * 1000) - offset
+            duration_of_total_segment = ms_to_audio_frames(int(end_time * 1000) - offset)
 
             if loop_type == "no_loop":
-                base_track = base_track.overlay(new_segment, offset)
+                length = len(samples)
             elif loop_type == "loop_complete_only":
                 # Keep adding instances of this sound until we can't anymore
-                looped_segment = AudioSegment.empty()
-                while len(looped_segment) <= duration_of_total_segment:
-                    looped_segment += new_segment
+                length = (duration_of_total_segment // len(samples) + 1) * len(samples)
+            elif loop_type == "loop_until_truncated":
+                length = duration_of_total_segment
+            else:
+                continue
+
+            # Anything past the end of the track is cut off
+            length = min(length, total_frames - start)
+            if length <= 0:
+                continue
+            # Every repetition is added at once, the last one cut short
+            repeats, tail = divmod(length, len(samples))
+            mix[start:start + length] += np.concatenate([np.tile(samples, (repeats, 1)), samples[:tail]])
+
+        gain = 10 ** (volume_adjustment / 20)
+        mixed = np.clip(mix * gain, -32768, 32767).astype(np.int16)
+        with profiler.span("audio export"):
+            with wave.open(f"{output_location}.wav", "wb") as f:
+                f.setnchannels(MIX_CHANNELS)
+                f.setsampwidth(2)
+                f.setframerate(MIX_FRAME_RATE)
+                f.writeframes(mixed.tobytes())
+        return f"{output_location}.wav"
+
+    def render_audio_alongside(self, render_video: Callable[[], int], output_location: str, volume_adjustment: float = 0.0) -> tuple[int, str]:
+        """
+        Calls `render_video`, which returns how many frames it rendered, and
+        renders the audio to `output_location`. When the frame count is
+        planned, the audio is mixed on another thread while the video
+        renders; it is mixed again afterwards if the video came out a
+        different length or cues were added while rendering.
+
+        Returns the frame count and the audio location.
+        """
+        planned_frames = self.get_planned_frame_count()
+        if planned_frames is None:
+            frame = render_video()
+            return frame, self.render_audio(frame * (1 / self.fps), output_location, volume_adjustment)
+
+        # Copied down to each cue, since cues still playing get their end
+        # time filled in while the video renders
+        audio_commands = [dict(audio) for audio in self.audio_commands]
+        with ThreadPoolExecutor(1, thread_name_prefix="AudioMix") as executor:
+            audio = executor.submit(self.render_audio, planned_frames * (1 / self.fps), output_location, volume_adjustment, audio_commands)
+            frame = render_video()
+            audio_location = audio.result()
+        if frame != planned_frames or self.audio_commands != audio_commands:
+            audio_location = self.render_audio(frame * (1 / self.fps), output_location, volume_adjustment)
+        return frame, audio_location
+
+    def start_video_stream(self, output_location: str):
+        """
+        Starts a long-lived ffmpeg process that encodes raw RGBA frames
+        written to its stdin, so encoding runs alongside rendering.
+        """
+        import ffmpeg
+        stream = ffmpeg.input("pipe:", format="rawvideo", pix_fmt="rgba", s=f"{self.scene.w}x{self.scene.h}", framerate=self.fps)
+        stream = ffmpeg.output(stream, output_location, vcodec='h264', pix_fmt='yuv420p')
+        stream = ffmpeg.overwrite_output(stream)
+        return ffmpeg.run_async(stream, pipe_stdin=True, pipe_stderr=True)
 
-                base_track = base_track.overlay(looped_segment, offset)
+    def step(self):
+        with profiler.span("Director.update"):
+            self.update(1 / self.fps)
+        with profiler.span("Sequencer.update"):
+            self.sequencer.update(1 / self.fps)
+        with profiler.span("Scene.update"):
+            self.scene.update(1 / self.fps)
 
-            elif loop_type == "loop_until_truncated":
-                looped_segment = AudioSegment.silent(duration=duration_of_total_segment)
-                looped_segment = looped_segment.overlay(new_segment, loop=True)
-                base_track = base_track.overlay(looped_segment, offset)
+    def advance(self, frame_count: int):
+        """
+        Steps the director through `frame_count` frames without rendering them.
+        Getting to a frame still means updating the scene for every frame
+        before it, since objects' state builds up over time; only the
+        compositing is skipped.
+        """
+        for _ in range(frame_count):
+            if self.is_done:
+                return
+            self.step()
+            self.time += 1 / self.fps
 
-        base_track += volume_adjustment
-        base_track.export(f"{output_location}.mp3", bitrate="312k")
+    def render_frames(self, workers: int = 1, frame_count: int = None):
+        """
+        Steps the director until it is done (or `frame_count` frames have been
+        rendered), yielding each rendered frame in order. With more than one worker, the scene is still updated in this
+        process but compositing is done by a process pool.
+
+        If nothing visible changed since the previous frame, the previous
+        image object is yielded again instead of being recomposited.
+        """
+        last_snapshot = None
+        if workers <= 1:
+            img = None
+            frames_left = frame_count
+            while not self.is_done and frames_left != 0:
+                if frames_left is not None:
+                    frames_left -= 1
+                self.step()
+                with profiler.span("Scene.get_render_snapshot"):
+                    snapshot = self.scene.get_render_snapshot()
+                profiler.count("frames")
+                if snapshot != last_snapshot:
+                    with profiler.span("Scene.render"):
+                        img = self.scene.composite(snapshot)
+                    last_snapshot = snapshot
+                else:
+                    profiler.count("frames reused")
+                yield img
+                self.time += 1 / self.fps
+            return
+
+        with ProcessPoolExecutor(workers, initializer=load_glyph_atlas, initargs=(glyph_atlas.glyphs, glyph_atlas.kerning)) as executor:
+            pending = deque()
+            future = None
+            frames_left = frame_count
+            while not self.is_done and frames_left != 0:
+                if frames_left is not None:
+                    frames_left -= 1
+                self.step()
+                with profiler.span("Scene.get_render_snapshot"):
+                    snapshot = self.scene.get_render_snapshot()
+                profiler.count("frames")
+                if snapshot != last_snapshot:
+                    future = executor.submit(composite_in_worker, self.scene.w, self.scene.h, self.scene.snapshot_keys, snapshot, self.scene.compositor, self.scene.dirty_regions)
+                    last_snapshot = snapshot
+                else:
+                    profiler.count("frames reused")
+                pending.append(future)
+                self.time += 1 / self.fps
+                # Keep a bounded number of frames in flight
+                if len(pending) >= workers * 2:
+                    with profiler.span("wait for compositor"):
+                        img = pending.popleft().result()
+                    yield img
+            while len(pending) > 0:
+                with profiler.span("wait for compositor"):
+                    img = pending.popleft().result()
+                yield img
+
+    def render_frame_runs(self, workers: int = 1, frame_count: int = None):
+        """
+        Like `render_frames`, but yields `(image, frame_count)` pairs where
+        consecutive identical frames are merged into one held frame.
+        """
+        held_img = None
+        count = 0
+        for img in self.render_frames(workers, frame_count):
+            if img is held_img:
+                count += 1
+                continue
+            if held_img is not None:
+                yield held_img, count
+            held_img = img
+            count = 1
+        if held_img is not None:
+            yield held_img, count
+
+    def get_output_format_data(self) -> dict:
+        return {
+            "version": RENDER_CACHE_VERSION,
+            "renderer": get_renderer_hash(type(self).__module__),
+            "fps": self.fps,
+            "w": self.scene.w,
+            "h": self.scene.h,
+        }
 
-    def render_movie(self, volume_adjustment: float = 0.0):
+    def get_render_key_data(self) -> dict | None:
+        """
+        Everything besides asset contents that affects the rendered movie, or
+        None if this director can't tell before rendering (e.g. because its
+        script or audio cues are only known while it updates). Only movies
+        with key data can be cached.
+        """
+        return None
+
+    def get_referenced_assets(self) -> set[str]:
+        assets = {audio["path"] for audio in self.audio_commands}
+        for object in self.scene.get_object_list():
+            if isinstance(object, ImageObject) and object.filepath is not None:
+                assets.add(object.filepath)
+        return assets
+
+    def get_render_key(self, volume_adjustment: float = 0.0) -> str | None:
+        data = self.get_render_key_data()
+        if data is None:
+            return None
+        data["volume_adjustment"] = volume_adjustment
+        data["assets"] = {path: hash_file(path) for path in sorted(self.get_referenced_assets())}
+        return hash_content(data)
+
+    def render_movie(self, volume_adjustment: float = 0.0, stream_frames: bool = False, workers: int = 1, cache: RenderCache = None, png_writers: int = 2) -> str:
+        """
+        Renders the movie and returns the location of the MP4. If `cache` is
+        given, a previous render of identical content is reused when there
+        is one. Unless frames are streamed, `png_writers` threads save PNG
+        frames while the next ones are rendered.
+        """
         self.time = 0.0
         self.is_done = False
-        frame: int = 0
         temp_folder_name = f"output-{int(time())}"
-        mkdir(temp_folder_name)
-        while not self.is_done:
-            self.update(1 / self.fps)
-            self.sequencer.update(1 / self.fps)
-            self.scene.update(1 / self.fps)
-            self.scene.render(f"{temp_folder_name}/{frame:010d}.png")
-            self.time += 1 / self.fps
-            frame += 1
+        output_location = f"{temp_folder_name}.mp4"
+
+        if cache is not None:
+            key = self.get_render_key(volume_adjustment)
+            if key is None:
+                raise Exception(f"{type(self).__name__} can't be cached")
+            if cache.get(key, output_location):
+                profiler.count("render cache hits")
+                print(f"Render cache hit for {key} (hit rate {cache.get_hit_rate():.1%})")
+                return output_location
+            profiler.count("render cache misses")
+            print(f"Render cache miss for {key} (hit rate {cache.get_hit_rate():.1%})")
+
+        with profiler.span("render_movie"):
+            if stream_frames:
+                self.render_movie_streamed(temp_folder_name, volume_adjustment, workers)
+            else:
+                self.render_movie_frames(temp_folder_name, volume_adjustment, workers, png_writers)
+        self.record_cache_counters()
 
-        self.render_audio(frame * (1 / self.fps), temp_folder_name, volume_adjustment)
-            
-        video_stream = ffmpeg.input(f"{temp_folder_name}/*.png", pattern_type="glob", framerate=self.fps)
-        audio_stream = ffmpeg.input(f"{temp_folder_name}.mp3")
+        if cache is not None:
+            cache.put(key, output_location)
+        return output_location
+
+    def record_cache_counters(self):
+        if not profiler.enabled:
+            return
+        resized = get_resized_frame.cache_info()
+        profiler.set_counter("image cache hits", image_cache.hits)
+        profiler.set_counter("image cache misses", image_cache.misses)
+        profiler.set_counter("resized frame hits", resized.hits)
+        profiler.set_counter("resized frame misses", resized.misses)
+        profiler.set_counter("glyph atlas hits", glyph_atlas.hits)
+        profiler.set_counter("glyph atlas misses", glyph_atlas.misses)
+
+    def render_movie_frames(self, temp_folder_name: str, volume_adjustment: float = 0.0, workers: int = 1, png_writers: int = 2):
+        import ffmpeg
+        mkdir(temp_folder_name)
+        # Held frames are only saved once and given a longer duration in
+        # the concat demuxer's file list
+        frame_list = []
+
+        def render_video() -> int:
+            frame: int = 0
+            with FrameWriter(png_writers) as writer:
+                for img, count in self.render_frame_runs(workers):
+                    file_name = f"{frame:010d}.png"
+                    writer.save(img, f"{temp_folder_name}/{file_name}")
+                    frame_list.append(f"file '{file_name}'\nduration {count / self.fps}\n")
+                    frame += count
+            if frame == 0:
+                raise Exception(f"{type(self).__name__} rendered no frames")
+            # The concat demuxer ignores the duration of the last entry, so
+            # it's listed again to hold it; that adds a frame, which the
+            # output drops with `vframes`
+            frame_list.append(f"file '{file_name}'\n")
+            return frame
+
+        frame_count, audio_location = self.render_audio_alongside(render_video, temp_folder_name, volume_adjustment)
+        with open(f"{temp_folder_name}/frames.txt", "w") as f:
+            f.writelines(frame_list)
+
+        video_stream = ffmpeg.input(f"{temp_folder_name}/frames.txt", format="concat", safe=0)
+        video_stream = ffmpeg.filter(video_stream, "fps", fps=self.fps)
+        audio_stream = ffmpeg.input(audio_location)
 
         stream = ffmpeg.concat(video_stream, audio_stream, v=1, a=1)
-        stream = ffmpeg.output(stream, f"{temp_folder_name}.mp4", vcodec='h264', acodec='aac', pix_fmt='yuv420p')
+        stream = ffmpeg.output(stream, f"{temp_folder_name}.mp4", vcodec='h264', acodec='aac', pix_fmt='yuv420p', vframes=frame_count)
         stream = ffmpeg.overwrite_output(stream)
-        ffmpeg.run(stream)
+        with profiler.span("ffmpeg"):
+            ffmpeg.run(stream)
 
         # Delete frames folder and audio track
-        remove(f"{temp_folder_name}.mp3")
-        rmtree(temp_folder_name)
\ No newline at end of file
+        remove(audio_location)
+        rmtree(temp_folder_name)
+
+    def write_video_stream(self, output_location: str, workers: int = 1, frame_count: int = None) -> int:
+        """
+        Renders frames straight into an ffmpeg encoder writing to
+        `output_location`, returning the number of frames written.
+        """
+        frame: int = 0
+        encoder = self.start_video_stream(output_location)
+        failed_write = False
+        # Drained as it's written, so ffmpeg never blocks on a full pipe
+        with ThreadPoolExecutor(1, thread_name_prefix="FFmpegStderr") as executor:
+            stderr = executor.submit(encoder.stderr.read)
+            try:
+                for img, count in self.render_frame_runs(workers, frame_count):
+                    # Repeat the raw buffer for held frames rather than recompositing
+                    with profiler.span("ffmpeg encode"):
+                        frame_bytes = img.tobytes()
+                        for _ in range(count):
+                            encoder.stdin.write(frame_bytes)
+                    frame += count
+            except BrokenPipeError:
+                # ffmpeg stopped reading, and its error output says why
+                failed_write = True
+            except BaseException:
+                encoder.kill()
+                raise
+            finally:
+                try:
+                    encoder.stdin.close()
+                except BrokenPipeError:
+                    pass
+                with profiler.span("ffmpeg"):
+                    return_code = encoder.wait()
+            # A truncated encode mustn't be cached or used as a finished one
+            if failed_write or return_code != 0:
+                raise Exception(f"ffmpeg exited with code {return_code} while encoding {output_location}:\n{stderr.result().decode(errors='replace')}")
+        return frame
+
+    def mux_audio(self, video_location: str, audio_location: str, output_location: str):
+        import ffmpeg
+        # Video is already encoded, so it only has to be muxed with the audio
+        video_stream = ffmpeg.input(video_location)
+        audio_stream = ffmpeg.input(audio_location)
+        stream = ffmpeg.output(video_stream, audio_stream, output_location, vcodec='copy', acodec='aac')
+        stream = ffmpeg.overwrite_output(stream)
+        with profiler.span("ffmpeg"):
+            ffmpeg.run(stream)
+
+    def render_movie_streamed(self, temp_name: str, volume_adjustment: float = 0.0, workers: int = 1):
+        _, audio_location = self.render_audio_alongside(
+            lambda: self.write_video_stream(f"{temp_name}-video.mp4", workers), temp_name, volume_adjustment
+        )
+        self.mux_audio(f"{temp_name}-video.mp4", audio_location, f"{temp_name}.mp4")
+
+        remove(audio_location)
+        remove(f"{temp_name}-video.mp4")
+
+    def get_segments(self) -> list[tuple[int, int]] | None:
+        """
+        Returns the `(start frame, end frame)` ranges the movie can be split
+        into and rendered separately, or None if this director can't tell
+        before rendering.
+        """
+        return None
+
+    def get_factory(self) -> Callable[[], 'Director'] | None:
+        """
+        Returns a picklable callable that creates a fresh copy of this
+        director, ready to render, so segments can be rendered in other
+        processes. Returns None if that isn't supported.
+        """
+        return None
+
+    def get_script_data(self) -> dict | None:
+        """
+        JSON-serializable description of everything needed to recreate this
+        director with `from_script_data` on another machine, or None if that
+        isn't supported.
+        """
+        return None
+
+    @classmethod
+    def from_script_data(cls, data: dict) -> 'Director':
+        """
+        Recreates a director from the output of `get_script_data`. Directors
+        that return script data have to override this too.
+        """
+        raise Exception(f"{cls.__name__} must implement from_script_data to be recreated from script data")
+
+    def get_state_data(self) -> list:
+        data = [object.get_state_data() for object in self.scene.get_object_list()]
+        data.append(self.sequencer.get_state_data())
+        return data
+
+    def get_segment_key_data(self, start: int, end: int) -> dict:
+        """
+        Everything besides asset contents that affects how frames `start` to
+        `end` look, given the director is currently at frame `start`.
+        """
+        data = self.get_output_format_data()
+        data["frames"] = end - start
+        data["entry_state"] = self.get_state_data()
+        return data
+
+    def get_segment_key(self, start: int, end: int, asset_hashes: dict) -> str:
+        data = self.get_segment_key_data(start, end)
+        data["assets"] = asset_hashes
+        return hash_content(data)
+
+    def render_segment(self, output_location: str, frame_count: int, workers: int = 1):
+        self.write_video_stream(output_location, workers, frame_count)
+
+    def render_movie_segmented(self, volume_adjustment: float = 0.0, workers: int = 1, segment_workers: int = 1, cache: RenderCache = None) -> str:
+        """
+        Renders each segment from `get_segments` as its own video file and
+        stitches them together with ffmpeg's concat demuxer. With `cache`,
+        segments are cached by the scene state they start from and what
+        happens during them, so after an edit only the affected segments are
+        rendered again. With more than one segment worker, segments that
+        need rendering are rendered in separate processes.
+        """
+        import ffmpeg
+        segments = self.get_segments()
+        if segments is None:
+            raise Exception(f"{type(self).__name__} can't be split into segments")
+
+        self.time = 0.0
+        self.is_done = False
+        temp_folder_name = f"output-{int(time())}"
+        mkdir(temp_folder_name)
+        asset_hashes = {path: hash_file(path) for path in sorted(self.get_referenced_assets())}
+
+        def render_video() -> int:
+            segment_files = []
+            jobs = []
+            cached = 0
+            for i, (start, end) in enumerate(segments):
+                location = f"{temp_folder_name}/segment-{i:05d}.mp4"
+                segment_files.append(location)
+                key = self.get_segment_key(start, end, asset_hashes)
+                if cache is not None and cache.get(key, location):
+                    cached += 1
+                    profiler.count("segment cache hits")
+                    self.advance(end - start)
+                elif segment_workers > 1:
+                    jobs.append((key, start, end, location))
+                    self.advance(end - start)
+                else:
+                    with profiler.span("render segment"):
+                        self.render_segment(location, end - start, workers)
+                    if cache is not None:
+                        cache.put(key, location)
+
+            if len(jobs) > 0:
+                factory = self.get_factory()
+                if factory is None:
+                    raise Exception(f"{type(self).__name__} can't render segments in other processes")
+                # Each worker walks one director forward through a run of
+                # consecutive jobs, so frames before a job are only stepped
+                # through once per worker rather than once per job
+                groups = group_by_frames(jobs, segment_workers, lambda job: job[2] - job[1])
+                with ProcessPoolExecutor(segment_workers) as executor:
+                    futures = [executor.submit(render_segment_job, factory, [(start, end, location) for _, start, end, location in group]) for group in groups]
+                    for group, future in zip(groups, futures):
+                        future.result()
+                        if cache is not None:
+                            for key, _, _, location in group:
+                                cache.put(key, location)
+
+            if cache is not None:
+                print(f"Rendered {len(segments) - cached} of {len(segments)} segments ({cached} cached)")
+
+            with open(f"{temp_folder_name}/segments.txt", "w") as f:
+                f.writelines(f"file '{location.split('/')[-1]}'\n" for location in segment_files)
+            stream = ffmpeg.input(f"{temp_folder_name}/segments.txt", format="concat", safe=0)
+            stream = ffmpeg.output(stream, f"{temp_folder_name}-video.mp4", c="copy")
+            stream = ffmpeg.overwrite_output(stream)
+            with profiler.span("ffmpeg"):
+                ffmpeg.run(stream)
+            return segments[-1][1] if len(segments) > 0 else 0
+
+        _, audio_location = self.render_audio_alongside(render_video, temp_folder_name, volume_adjustment)
+        self.mux_audio(f"{temp_folder_name}-video.mp4", audio_location, f"{temp_folder_name}.mp4")
+
+        remove(audio_location)
+        remove(f"{temp_folder_name}-video.mp4")
+        rmtree(temp_folder_name)
+        self.record_cache_counters()
+        return f"{temp_folder_name}.mp4"
+
+def group_by_frames(items: list, group_count: int, get_frame_count: Callable[[object], int]) -> list[list]:
+    """
+    Splits `items`, in frame order, into at most `group_count` runs of
+    consecutive items with roughly the same number of frames each. Used to
+    hand out segments to worker processes and shards to machines.
+    """
+    frames_left = sum(get_frame_count(item) for item in items)
+    groups = []
+    group = []
+    group_frames = 0
+    for item in items:
+        group.append(item)
+        group_frames += get_frame_count(item)
+        # Spread whatever is left evenly over the groups that are left
+        if group_frames >= frames_left / max(group_count - len(groups), 1):
+            groups.append(group)
+            frames_left -= group_frames
+            group = []
+            group_frames = 0
+    if len(group) > 0:
+        groups.append(group)
+    return groups
+
+def render_segment_job(factory: Callable[[], Director], segments: list[tuple[int, int, str]]):
+    """
+    Renders each `(start frame, end frame, output location)` segment, in
+    order, with one fresh director. The director has to be stepped from the
+    first frame, so the cost of reaching a run's first segment grows with
+    how far into the movie it is; only the gaps between the run's segments
+    are stepped through after that.
+    """
+    director = factory()
+    director.time = 0.0
+    director.is_done = False
+    frame = 0
+    for start, end, output_location in segments:
+        director.advance(start - frame)
+        director.render_segment(output_location, end - start)
+        frame = end
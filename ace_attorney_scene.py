@@ -5,17 +5,42 @@ from MovieKit import (
     MoveSceneObjectAction,
     SimpleTextObject,
     Director,
+    get_font_key,
+    get_font_from_key,
+    load_font,
 )
 from math_helpers import ease_in_out_cubic
 from PIL import Image, ImageDraw, ImageFont
-from parse_tags import DialoguePage, DialogueTextChunk, DialogueAction, DialogueTextLineBreak
+from parse_tags import DialoguePage, DialogueTextChunk, DialogueTextLineBreak
 from font_tools import get_best_font
+from render_cache import hash_content
+from glyph_atlas import glyph_atlas
+from numpy_compositor import blend_fill, fill_rect, clip_buffer
 from font_constants import TEXT_COLORS, FONT_ARRAY
-from typing import Callable, Optional
-from os.path import exists
-from shlex import split
+from timeline import (
+    compile_timeline,
+    get_exclamation_sound_path,
+    DESK_SLAM_SOUND_DELAY,
+    TimelineEvent,
+    PageStartEvent,
+    CharRevealEvent,
+    ItemCompleteEvent,
+    SpriteEvent,
+    BubbleEvent,
+    DeskSlamEvent,
+    ArrowEvent,
+    BoxEvent,
+    NametagEvent,
+    ShakeEvent,
+    FlashEvent,
+    CameraEvent,
+    EndEvent,
+)
+from typing import Callable
+from functools import partial
 from math import cos, sin, pi
-from random import random
+from random import Random
+import numpy as np
 
 class NameBox(SceneObject):
     def __init__(self, parent: SceneObject, pos: tuple[int, int, int]):
@@ -52,6 +77,9 @@ class NameBox(SceneObject):
         self.text = text
         self.namebox_text.text = self.text
 
+    def get_state_data(self):
+        return super().get_state_data() + [self.text]
+
     def update(self, delta):
         length = int(self.font.getlength(self.text))
         self.namebox_c.width = length + 4
@@ -97,52 +125,214 @@ class DialogueBox(SceneObject):
 
         self.on_complete: Callable[[], None] = None
 
-    def render(self, img: Image.Image, ctx: ImageDraw.ImageDraw):
+    def get_render_state(self):
         if self.page is None:
-            return
+            return None
 
-        # x, y, _ = self.get_absolute_position()
-        x, y = self.x, self.y
+        runs = []
         line_no = 0
-        x_offset = 220 if self.use_rtl else 0
         for command in self.page.commands:
             if isinstance(command, DialogueTextLineBreak):
                 line_no += 1
-                x_offset = 220 if self.use_rtl else 0
             elif isinstance(command, DialogueTextChunk):
-                text_str = command.text[:command.position]
-                drawing_args = {
-                    "xy": (
-                        10 + x + x_offset,
-                        4 + y + (self.font_size) * line_no,
-                    ),
-                    "text": text_str,
-                    "fill": (255, 0, 255),
-                    "anchor": ("r" if self.use_rtl else "l") + "a",
-                }
-
                 if len(command.tags) == 0:
-                    drawing_args["fill"] = (255, 255, 255)
+                    fill = (255, 255, 255)
                 else:
-                    drawing_args["fill"] = TEXT_COLORS.get(
-                        command.tags[-1], (255, 255, 255)
-                    )
-
-                if self.font is not None:
-                    drawing_args["font"] = self.font
+                    fill = TEXT_COLORS.get(command.tags[-1], (255, 255, 255))
+                runs.append((line_no, command.text[:command.position], fill))
 
-                ctx.text(**drawing_args)
+        # x, y, _ = self.get_absolute_position()
+        return (self.x, self.y, self.use_rtl, self.font_size, get_font_key(self.font), tuple(runs))
+
+    @staticmethod
+    def get_text_layer(state: tuple, size: tuple[int, int]) -> 'DialogueTextLayer':
+        x, y, use_rtl, font_size, font_key, runs = state
+        layer_key = (size, x, y, use_rtl, font_size, font_key)
+        if layer_key not in dialogue_text_layers:
+            dialogue_text_layers.clear()
+            dialogue_text_layers[layer_key] = DialogueTextLayer(size, x, y, use_rtl, font_size, get_font_from_key(font_key))
+        layer = dialogue_text_layers[layer_key]
+        layer.update(runs)
+        return layer
+
+    @staticmethod
+    def draw_render_state(state: tuple, img: Image.Image, ctx: ImageDraw.ImageDraw):
+        DialogueBox.get_text_layer(state, img.size).draw(img)
+
+    @staticmethod
+    def draw_render_state_array(state: tuple, buffer: np.ndarray, clip: tuple[int, int, int, int] = None):
+        DialogueBox.get_text_layer(state, (buffer.shape[1], buffer.shape[0])).draw_array(buffer, clip)
+
+    @staticmethod
+    def get_line_bounds(state: tuple, line_numbers: set[int]) -> tuple[int, int, int, int]:
+        x, y, use_rtl, font_size, font_key, runs = state
+        if len(line_numbers) == 0:
+            return (x, y, x, y)
+        # Any column, and a line's worth of room above and below for glyphs
+        # that reach outside their line
+        top = 4 + y + font_size * (min(line_numbers) - 1)
+        bottom = 4 + y + font_size * (max(line_numbers) + 2)
+        return (-(1 << 16), top, 1 << 16, bottom)
+
+    @staticmethod
+    def get_render_state_bounds(state: tuple):
+        return DialogueBox.get_line_bounds(state, {line_no for line_no, _, _ in state[5]})
+
+    @classmethod
+    def get_render_state_change_bounds(cls, old_state: tuple, new_state: tuple):
+        if old_state[:5] != new_state[:5]:
+            return super().get_render_state_change_bounds(old_state, new_state)
+        old_runs, new_runs = old_state[5], new_state[5]
+        first_changed = 0
+        while first_changed < min(len(old_runs), len(new_runs)) and old_runs[first_changed] == new_runs[first_changed]:
+            first_changed += 1
+        # Later runs on the same line move when an earlier one changes, so
+        # every line from the first changed run on is dirty
+        lines = {line_no for line_no, _, _ in old_runs[first_changed:] + new_runs[first_changed:]}
+        return DialogueBox.get_line_bounds(new_state, lines)
+
+class DialogueTextLayer:
+    """
+    The dialogue text drawn so far, kept between frames so each frame only
+    has to draw the newly revealed characters. Each run's coverage is kept
+    in an "L" mask of its own, and pasting the run's colour through it
+    blends like drawing the run on the frame. Separate masks keep runs
+    whose glyphs overlap from changing each other's colour or coverage.
+    """
+    def __init__(self, size: tuple[int, int], x: int, y: int, use_rtl: bool, font_size: int, font: ImageFont.FreeTypeFont):
+        self.size = size
+        self.x = x
+        self.y = y
+        self.use_rtl = use_rtl
+        self.font_size = font_size
+        self.font = font
+        # Right-to-left text may need shaping, so it isn't drawn glyph by glyph
+        self.use_atlas = font is not None and not use_rtl and font.path not in RTL_FONT_PATHS
+        self.measure_ctx = ImageDraw.ImageDraw(Image.new("L", (1, 1)))
+        self.clear()
+
+    def clear(self):
+        # (line_no, text drawn so far, fill) and the x offset each run starts at
+        self.drawn_runs: list[tuple[int, str, tuple]] = []
+        self.run_offsets: list[float] = []
+        self.run_masks: list[Image.Image] = []
+        # Each run's mask cropped to its ink, or None if it needs cropping again
+        self.run_crops: list[tuple[Image.Image, tuple[int, int, int, int]] | None] = []
+
+    def get_text_length(self, text: str) -> float:
+        if self.use_atlas:
+            return glyph_atlas.get_length(text, self.font)
+        try:
+            # TODO: I think the Pillow docs say this isn't actually
+            # how you should get the true text length due to kerning,
+            # but I'm too tired right now to do it the "right" way
+            # and so far it doesn't seem to have broken significantly.
+            return self.measure_ctx.textlength(text, font=self.font)
+        except UnicodeEncodeError:
+            return self.font.getsize(text)[0]
+
+    def is_continued_by(self, runs: tuple) -> bool:
+        # Every run drawn so far must still be there unchanged, except the
+        # last one, which may have had more characters revealed since
+        if len(runs) < len(self.drawn_runs):
+            return False
+        for i, (line_no, text_str, fill) in enumerate(self.drawn_runs):
+            new_line_no, new_text_str, new_fill = runs[i]
+            if line_no != new_line_no or fill != new_fill:
+                return False
+            if new_text_str != text_str and (i < len(self.drawn_runs) - 1 or not new_text_str.startswith(text_str)):
+                return False
+        return True
+
+    def update(self, runs: tuple):
+        # Runs not revealed yet are left out, so the next run to be revealed
+        # continues the layer instead of rebuilding it
+        revealed = len(runs)
+        while revealed > 0 and runs[revealed - 1][1] == "":
+            revealed -= 1
+        runs = runs[:revealed]
+
+        if not self.is_continued_by(runs):
+            self.clear()
+
+        line_start = 220 if self.use_rtl else 0
+        for i, (line_no, text_str, fill) in enumerate(runs):
+            if i < len(self.drawn_runs):
+                x_offset = self.run_offsets[i]
+                drawn_text = self.drawn_runs[i][1]
+            else:
+                # Runs continue from the end of the previous run on the same line
+                x_offset = line_start
+                if i > 0 and self.drawn_runs[i - 1][0] == line_no:
+                    previous_length = self.get_text_length(self.drawn_runs[i - 1][1])
+                    x_offset = self.run_offsets[i - 1] + (previous_length * -1 if self.use_rtl else previous_length)
+                drawn_text = ""
+                self.drawn_runs.append((line_no, "", fill))
+                self.run_offsets.append(x_offset)
+                self.run_masks.append(Image.new("L", self.size))
+                self.run_crops.append(None)
+
+            if len(text_str) > len(drawn_text):
+                if self.use_rtl:
+                    # Right-anchored runs move as they grow, so the run is
+                    # erased and redrawn in full
+                    self.run_masks[i] = Image.new("L", self.size)
+                    self.draw_text(self.run_masks[i], x_offset, line_no, text_str)
+                else:
+                    # Measured up to the first new character, so the kerning
+                    # between it and the text already drawn is kept
+                    first_new = text_str[len(drawn_text)]
+                    drawn_length = self.get_text_length(drawn_text + first_new) - self.get_text_length(first_new)
+                    self.draw_text(self.run_masks[i], x_offset + drawn_length, line_no, text_str[len(drawn_text):])
+                self.drawn_runs[i] = (line_no, text_str, fill)
+                self.run_crops[i] = None
+
+    def draw_text(self, mask: Image.Image, x_offset: float, line_no: int, text_str: str):
+        drawing_args = {
+            "xy": (
+                10 + self.x + x_offset,
+                4 + self.y + (self.font_size) * line_no,
+            ),
+            "text": text_str,
+            "anchor": ("r" if self.use_rtl else "l") + "a",
+        }
 
-                try:
-                    # TODO: I think the Pillow docs say this isn't actually
-                    # how you should get the true text length due to kerning,
-                    # but I'm too tired right now to do it the "right" way
-                    # and so far it doesn't seem to have broken significantly.
-                    add_to_x_offset = ctx.textlength(text_str, font=self.font)
-                except UnicodeEncodeError:
-                    add_to_x_offset = self.font.getsize(text_str)[0]
+        if self.font is not None:
+            drawing_args["font"] = self.font
 
-                x_offset += (add_to_x_offset * -1) if self.use_rtl else add_to_x_offset
+        if self.use_atlas:
+            glyph_atlas.draw_text(mask, fill=255, **drawing_args)
+        else:
+            ImageDraw.ImageDraw(mask).text(fill=255, **drawing_args)
+
+    def get_runs(self) -> list[tuple[Image.Image, tuple[int, int, int, int], tuple]]:
+        """
+        `(mask, bbox, fill)` for every run with ink, in drawing order, with
+        each mask cropped to `bbox`.
+        """
+        runs = []
+        for i, (_, _, fill) in enumerate(self.drawn_runs):
+            if self.run_crops[i] is None:
+                bbox = self.run_masks[i].getbbox()
+                self.run_crops[i] = (None, None) if bbox is None else (self.run_masks[i].crop(bbox), bbox)
+            mask, bbox = self.run_crops[i]
+            if mask is not None:
+                runs.append((mask, bbox, fill))
+        return runs
+
+    def draw(self, img: Image.Image):
+        for mask, bbox, fill in self.get_runs():
+            img.paste(fill, bbox, mask=mask)
+
+    def draw_array(self, buffer: np.ndarray, clip: tuple[int, int, int, int] = None):
+        view, left, top = clip_buffer(buffer, clip)
+        for mask, bbox, fill in self.get_runs():
+            blend_fill(view, bbox[0] - left, bbox[1] - top, np.asarray(mask), fill)
+
+RTL_FONT_PATHS = {font["path"] for font in FONT_ARRAY if font.get("rtl", False)}
+
+# Text layers are only reused by the box that made them, so one is enough
+dialogue_text_layers: dict[tuple, DialogueTextLayer] = {}
 
 class ExclamationObject(ImageObject):
     def __init__(self, parent: SceneObject, director: 'AceAttorneyDirector'):
@@ -154,12 +344,7 @@ class ExclamationObject(ImageObject):
         self.director = director
 
     def get_exclamation_path(self, type: str, speaker: str):
-        base_name = f"new_assets/exclamations/{type}-{speaker}"
-        if exists(f"{base_name}.mp3"):
-            return f"{base_name}.mp3"
-        elif exists(f"{base_name}.wav"):
-            return f"{base_name}.wav"
-        return f"new_assets/exclamations/objection-generic.wav"
+        return get_exclamation_sound_path(type, speaker)
 
     def play_objection(self, speaker: str):
         self.play_exclamation("objection", speaker)
@@ -171,31 +356,43 @@ class ExclamationObject(ImageObject):
         self.play_exclamation("takethat", speaker)
 
     def play_exclamation(self, type: str, speaker: str):
+        self.show_exclamation(type)
+        self.director.audio_commands.append({
+            "type": "audio",
+            "path": self.get_exclamation_path(type, speaker),
+            "offset": self.director.time
+        })
+
+    def show_exclamation(self, type: str):
+        """
+        Shows the exclamation without queueing its sound, for timelines
+        that already have the sound as an audio cue.
+        """
         self.set_filepath(
             f"new_assets/exclamations/{type}.gif",
             {
                 0.7: lambda: self.set_filepath(None)
             })
 
-        audio_path = self.get_exclamation_path(type, speaker)
-
-        self.director.audio_commands.append({
-            "type": "audio",
-            "path": audio_path,
-            "offset": self.director.time
-        })
-
 class ShakerObject(SceneObject):
     magnitude: float = 0.0
     remaining: float = 0.0
+
+    def __init__(self, parent: SceneObject = None, name: str = "", pos: tuple[int, int, int] = (0, 0, 0), rng: Random = None):
+        super().__init__(parent, name, pos)
+        self.rng = rng if rng is not None else Random()
+
     def start_shaking(self, magnitude, duration):
         self.magnitude = magnitude
         self.remaining = duration
 
+    def get_state_data(self):
+        return super().get_state_data() + [self.magnitude, self.remaining]
+
     def update(self, delta):
         self.remaining -= delta
         if self.remaining > 0:
-            angle = random() * 2 * pi
+            angle = self.rng.random() * 2 * pi
             x_offset = int(cos(angle) * self.magnitude)
             y_offset = int(sin(angle) * self.magnitude)
             self.set_x(x_offset)
@@ -213,19 +410,40 @@ class ColorOverlayObject(SceneObject):
         self.color = color
         self.remaining = duration
 
+    def get_state_data(self):
+        return super().get_state_data() + [self.color, self.remaining]
+
     def update(self, delta):
         self.remaining -= delta
         if self.remaining < 0:
             self.remaining = 0
 
-    def render(self, img: Image.Image, ctx: ImageDraw.ImageDraw):
+    def get_render_state(self):
         if self.remaining > 0:
-            ctx.rectangle(xy=(0, 0, img.width, img.height), fill=self.color)
+            return (self.color,)
+        return None
+
+    @staticmethod
+    def draw_render_state(state: tuple, img: Image.Image, ctx: ImageDraw.ImageDraw):
+        color, = state
+        ctx.rectangle(xy=(0, 0, img.width, img.height), fill=color)
+
+    @staticmethod
+    def draw_render_state_array(state: tuple, buffer: np.ndarray, clip: tuple[int, int, int, int] = None):
+        color, = state
+        fill_rect(buffer, color, clip)
 
 class AceAttorneyDirector(Director):
-    def __init__(self, fps: float = 30):
+    def __init__(self, fps: float = 30, seed: int = 0):
         super().__init__(None, fps)
 
+        # Seeded so that renders of the same script shake identically,
+        # whichever process ends up compositing the frames. Reseeded at the
+        # start of every page, so how a page shakes doesn't depend on how
+        # earlier pages did or where the page is in the script
+        self.seed = seed
+        self.rng = Random(seed)
+
         self.root = SceneObject(name="Root")
 
         self.white_flash = ColorOverlayObject(
@@ -238,7 +456,8 @@ class AceAttorneyDirector(Director):
         self.bg_shaker = ShakerObject(
             parent=self.root,
             name="Background Shaker",
-            pos=(0, 0, 0)
+            pos=(0, 0, 0),
+            rng=self.rng
         )
 
         self.bg = ImageObject(
@@ -265,7 +484,8 @@ class AceAttorneyDirector(Director):
         self.textbox_shaker = ShakerObject(
             parent=self.root,
             name="Text Box Shaker",
-            pos=(0,0,0)
+            pos=(0,0,0),
+            rng=self.rng
         )
 
         self.exclamation = ExclamationObject(
@@ -279,154 +499,175 @@ class AceAttorneyDirector(Director):
 
     def set_current_pages(self, pages: list[DialoguePage]):
         self.pages = pages
+        # Pages may have been played before, e.g. when a copy is made to
+        # render a segment in another process
+        for page in pages:
+            page.reset_progress()
         self.page_index = 0
-        self.local_time = 0
-        self.cur_time_for_char = 0.0
+        self.frame = 0
+        self.timeline = compile_timeline(pages, self.fps, self.max_time_for_char)
+        self.prepare_glyphs()
+        # Every audio cue is known once the timeline is compiled. Copied,
+        # since the play_* methods may add more
+        self.audio_commands = list(self.timeline.audio_commands)
+        self.current_music_track = None
+        self.current_voice_blips = None
 
-    cur_time_for_char: float = 0.0
     max_time_for_char: float = 0.03
 
+    def get_planned_frame_count(self) -> int:
+        return self.timeline.total_frames
+
+    def get_render_key_data(self) -> dict:
+        data = self.get_output_format_data()
+        data["seed"] = self.seed
+        data["max_time_for_char"] = self.max_time_for_char
+        data["pages"] = [page.get_content_data() for page in self.pages]
+        return data
+
+    def get_referenced_assets(self) -> set[str]:
+        assets = super().get_referenced_assets()
+        assets.update(font["path"] for font in FONT_ARRAY)
+        assets.add(self.textbox.namebox.font.path)
+        for events in self.timeline.events.values():
+            for event in events:
+                if isinstance(event, SpriteEvent):
+                    assets.add(event.path)
+                elif isinstance(event, DeskSlamEvent):
+                    assets.add(get_sprite_location(event.character, "deskslam"))
+                elif isinstance(event, BubbleEvent):
+                    assets.add(f"new_assets/exclamations/{event.exclamation_type}.gif")
+        return assets
+
+    def get_segments(self) -> list[tuple[int, int]]:
+        # One segment per page, so editing a page only re-renders that page
+        # (and any later ones whose starting state it changed)
+        ends = self.timeline.page_start_frames[1:] + [self.timeline.total_frames]
+        return list(zip(self.timeline.page_start_frames, ends))
+
+    def get_factory(self) -> Callable[[], Director]:
+        return partial(AceAttorneyDirector.from_script_data, self.get_script_data())
+
+    def get_script_data(self) -> dict:
+        return {
+            "fps": self.fps,
+            "seed": self.seed,
+            "max_time_for_char": self.max_time_for_char,
+            "pages": [page.get_content_data() for page in self.pages],
+        }
+
+    @classmethod
+    def from_script_data(cls, data: dict) -> 'AceAttorneyDirector':
+        director = cls(data["fps"], data["seed"])
+        director.max_time_for_char = data["max_time_for_char"]
+        director.set_current_pages([DialoguePage.from_content_data(page) for page in data["pages"]])
+        return director
+
+    def get_segment_key_data(self, start: int, end: int) -> dict:
+        data = super().get_segment_key_data(start, end)
+        data["max_time_for_char"] = self.max_time_for_char
+        data["events"] = self.timeline.get_event_data(start, end)
+        first_page = self.timeline.get_page_index(start)
+        last_page = self.timeline.get_page_index(end - 1)
+        data["pages"] = [page.get_content_data() for page in self.pages[first_page:last_page + 1]]
+        return data
+
+    def prepare_glyphs(self):
+        """
+        Rasterizes every glyph the pages and name tags will need up front, so
+        render workers start with a full glyph atlas.
+        """
+        for page in self.pages:
+            font_data = get_best_font(page.get_raw_text(), FONT_ARRAY)
+            if font_data["path"] not in RTL_FONT_PATHS:
+                glyph_atlas.prepare(load_font(font_data["path"], 16), page.get_raw_text())
+        for events in self.timeline.events.values():
+            for event in events:
+                if isinstance(event, NametagEvent):
+                    glyph_atlas.prepare(self.textbox.namebox.font, event.name)
+        glyph_atlas.prepare(self.textbox.namebox.font, self.textbox.namebox.text)
+
     def update(self, delta: float):
-        # If the current page index is greater than the number of pages, then we've
-        # used all the pages - in other words, we're done.
-        if self.page_index >= len(self.pages):
-            self.end_music_track()
-            self.end_voice_blips()
-            self.is_done = True
-            return
-
-        # Find which page we are on
-        self.current_page = self.pages[self.page_index]
-        self.textbox.page = self.current_page
-        self.textbox.font_data = get_best_font(self.current_page.get_raw_text(), FONT_ARRAY)
-        self.textbox.font = ImageFont.truetype(self.textbox.font_data["path"], 16)
-
-        # Within that page, get the current object
-        current_dialogue_obj = self.current_page.get_current_item()
-
-        if isinstance(current_dialogue_obj, DialogueTextChunk):
-            self.cur_time_for_char += delta
-            if self.cur_time_for_char >= self.max_time_for_char:
-                # Increment the progress through the current dialogue object
-                # by one. This will make it render more characters in render()
-                current_dialogue_obj.position += 1
-                self.cur_time_for_char = 0
-                if current_dialogue_obj.position >= len(current_dialogue_obj.text):
-                    current_dialogue_obj.completed = True
-
-        elif isinstance(current_dialogue_obj, DialogueAction):
-            # Handle actions
-            # Most actions can be taken care of instantly and then marked complete
-            # Wait actions need the timer to fill up before they can be marked complete
-            action_split = split(current_dialogue_obj.name)
-            match action_split:
-                case ["startblip", voice_type]:
-                    self.start_voice_blips(voice_type)
-                    current_dialogue_obj.completed = True
-
-                case ["stopblip"]:
-                    self.end_voice_blips()
-                    current_dialogue_obj.completed = True
-
-                case ["sprite", position, path]:
-                    if position == "left":
-                        self.phoenix.set_filepath(path)
-                    elif position == "right":
-                        self.edgeworth.set_filepath(path)
-                    else:
-                        print(f"Error in sprite command: unknown position \"{position}\"")
-                    current_dialogue_obj.completed = True
-
-                case ["wait", duration_str]:
-                    self.cur_time_for_char += delta
-                    if self.cur_time_for_char >= float(duration_str):
-                        current_dialogue_obj.completed = True
-                        self.cur_time_for_char = 0.0
-
-                case ["bubble", exclamation_type, character]:
-                    self.exclamation.play_exclamation(exclamation_type, character)
-                    current_dialogue_obj.completed = True
-
-                case ["deskslam", character]:
-                    if character == "phoenix":
-                        self.play_phoenix_desk_slam()
-                    elif character == "edgeworth":
-                        self.play_edgeworth_desk_slam()
-                    current_dialogue_obj.completed = True
-
-                case ["showarrow"]:
-                    self.textbox.arrow.visible = True
-                    current_dialogue_obj.completed = True
-                
-                case ["hidearrow"]:
-                    self.textbox.arrow.visible = False
-                    current_dialogue_obj.completed = True
-
-                case ["showbox"]:
-                    self.textbox.show()
-                    current_dialogue_obj.completed = True
-
-                case ["hidebox"]:
-                    self.textbox.hide()
-                    current_dialogue_obj.completed = True
-
-                case ["nametag", name]:
-                    self.textbox.namebox.set_text(name)
-                    current_dialogue_obj.completed = True
-
-                case ["sound", sound_path]:
-                    self.audio_commands.append({
-                        "type": "audio",
-                        "path": f"new_assets/sound/sfx-{sound_path}.wav",
-                        "offset": self.time
-                    })
-                    current_dialogue_obj.completed = True
-
-                case ["shake", magnitude_str, duration_str]:
-                    magnitude = float(magnitude_str)
-                    duration = float(duration_str)
-                    self.bg_shaker.start_shaking(magnitude, duration)
-                    self.textbox_shaker.start_shaking(magnitude, duration)
-                    current_dialogue_obj.completed = True
-
-                case ["flash", duration_str]:
-                    duration = float(duration_str)
-                    self.white_flash.start_color((255,255,255), duration)
-                    current_dialogue_obj.completed = True
-
-                case ["music", "start", music_name]:
-                    self.start_music_track(music_name)
-                    current_dialogue_obj.completed = True
-
-                case ["music", "stop"]:
-                    self.end_music_track()
-                    current_dialogue_obj.completed = True
-
-                case ["cut", position]:
-                    if position == "left":
-                        self.cut_to_left()
-                    elif position == "right":
-                        self.cut_to_right()
-                    current_dialogue_obj.completed = True
-
-                case ["pan", position]:
-                    if position == "left":
-                        self.pan_to_left()
-                    elif position == "right":
-                        self.pan_to_right()
-                    current_dialogue_obj.completed = True
-
-                case _:
-                    current_dialogue_obj.completed = True
-     
-        elif isinstance(current_dialogue_obj, DialogueTextLineBreak):
-            # Does anything need to be done here? I think this can be handled
-            # entirely in render()
-            current_dialogue_obj.completed = True
-
-        elif current_dialogue_obj is None:
-            # Done with the current page - let's try to get the next page!
-            self.page_index += 1
+        for event in self.timeline.get_events(self.frame):
+            self.apply_event(event)
+        self.frame += 1
+
+    def apply_event(self, event: TimelineEvent):
+        match event:
+            case PageStartEvent(page_index=page_index):
+                # Font only depends on the page's text, so resolve it once per page
+                self.page_index = page_index
+                self.current_page = self.pages[page_index]
+                # Seeded by the page's content rather than its index, so a
+                # segment's shake only depends on what's in its key
+                self.rng.seed(f"{self.seed}-{hash_content(self.current_page.get_content_data())}")
+                self.textbox.page = self.current_page
+                self.textbox.font_data = get_best_font(self.current_page.get_raw_text(), FONT_ARRAY)
+                self.textbox.font = load_font(self.textbox.font_data["path"], 16)
+
+            case CharRevealEvent(chunk=chunk, position=position):
+                # This will make the text box render more characters in render()
+                chunk.position = position
+
+            case ItemCompleteEvent(item=item):
+                item.completed = True
+
+            case SpriteEvent(position="left", path=path):
+                self.phoenix.set_filepath(path)
+
+            case SpriteEvent(position="right", path=path):
+                self.edgeworth.set_filepath(path)
+
+            case SpriteEvent(position=position):
+                print(f"Error in sprite command: unknown position \"{position}\"")
+
+            # Sounds for these are already audio cues in the timeline
+            case BubbleEvent(exclamation_type=exclamation_type):
+                self.exclamation.show_exclamation(exclamation_type)
+
+            case DeskSlamEvent(character="phoenix"):
+                self.show_phoenix_desk_slam()
+
+            case DeskSlamEvent(character="edgeworth"):
+                self.show_edgeworth_desk_slam()
+
+            case ArrowEvent(visible=visible):
+                self.textbox.arrow.visible = visible
+
+            case BoxEvent(visible=True):
+                self.textbox.show()
+
+            case BoxEvent(visible=False):
+                self.textbox.hide()
+
+            case NametagEvent(name=name):
+                self.textbox.namebox.set_text(name)
+
+            case ShakeEvent(magnitude=magnitude, duration=duration):
+                self.bg_shaker.start_shaking(magnitude, duration)
+                self.textbox_shaker.start_shaking(magnitude, duration)
+
+            case FlashEvent(duration=duration):
+                self.white_flash.start_color((255,255,255), duration)
+
+            case CameraEvent(position="left", pan=True):
+                self.pan_to_left()
+
+            case CameraEvent(position="right", pan=True):
+                self.pan_to_right()
+
+            case CameraEvent(position="left", pan=False):
+                self.cut_to_left()
+
+            case CameraEvent(position="right", pan=False):
+                self.cut_to_right()
+
+            case EndEvent():
+                # Only tracks started outside the timeline are still playing
+                self.end_music_track()
+                self.end_voice_blips()
+                self.page_index = len(self.pages)
+                self.is_done = True
 
     def pan_to_right(self):
         self.sequencer.run_action(
@@ -454,8 +695,11 @@ class AceAttorneyDirector(Director):
     def cut_to_right(self):
         self.bg.set_x(-1296 + 256)
 
-    current_music_track: Optional[dict] = None
-    current_voice_blips: Optional[dict] = None
+    current_music_track: dict | None = None
+    current_voice_blips: dict | None = None
+
+    # The methods below queue their sounds at the director's current time,
+    # for callers outside the compiled timeline
 
     def start_music_track(self, name: str):
         self.end_music_track()
@@ -496,6 +740,21 @@ class AceAttorneyDirector(Director):
         })
 
     def play_phoenix_desk_slam(self):
+        self.show_phoenix_desk_slam()
+        self.queue_desk_slam_sound("phoenix")
+
+    def play_edgeworth_desk_slam(self):
+        self.show_edgeworth_desk_slam()
+        self.queue_desk_slam_sound("edgeworth")
+
+    def queue_desk_slam_sound(self, character: str):
+        self.audio_commands.append({
+            "type": "audio",
+            "path": "new_assets/sound/sfx-deskslam.wav",
+            "offset": self.time + DESK_SLAM_SOUND_DELAY[character]
+        })
+
+    def show_phoenix_desk_slam(self):
         fp_before = self.phoenix.filepath
         cb_before = self.phoenix.callbacks
         self.phoenix.set_filepath(
@@ -503,13 +762,8 @@ class AceAttorneyDirector(Director):
             {
                 0.8: lambda: self.phoenix.set_filepath(fp_before, cb_before)
             })
-        self.audio_commands.append({
-            "type": "audio",
-            "path": "new_assets/sound/sfx-deskslam.wav",
-            "offset": self.time + 0.15
-        })
 
-    def play_edgeworth_desk_slam(self):
+    def show_edgeworth_desk_slam(self):
         fp_before = self.edgeworth.filepath
         cb_before = self.edgeworth.callbacks
         self.edgeworth.set_filepath(
@@ -517,11 +771,6 @@ class AceAttorneyDirector(Director):
             {
                 0.8: lambda: self.edgeworth.set_filepath(fp_before, cb_before)
             })
-        self.audio_commands.append({
-            "type": "audio",
-            "path": "new_assets/sound/sfx-deskslam.wav",
-            "offset": self.time + 0.25
-        })
 
 def get_sprite_location(character: str, emotion: str):
     return f"new_assets/character_sprites/{character}/{character}-{emotion}.gif"
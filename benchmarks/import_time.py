@@ -0,0 +1,64 @@
+"""
+Measures how long it takes to import the render entry point modules in a
+fresh interpreter, and fails if any of them is over budget or pulls in a
+dependency that should only be loaded on first use.
+
+    python benchmarks/import_time.py
+"""
+from subprocess import run
+from sys import executable, exit
+from os.path import dirname, abspath
+import json
+
+REPO_DIR = dirname(dirname(abspath(__file__)))
+
+# Seconds, as the best of several runs
+IMPORT_BUDGETS = {
+    "font_tools": 0.5,
+    "parse_tags": 0.5,
+    "MovieKit": 1.0,
+    "ace_attorney_scene": 1.5,
+}
+
+LAZY_MODULES = ["spacy", "pydub", "ffmpeg", "fontTools"]
+
+MEASURE_SCRIPT = """
+import sys, json
+from time import perf_counter
+start = perf_counter()
+import {module}
+elapsed = perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {lazy} if m in sys.modules]}}))
+"""
+
+def measure_import(module: str, runs: int = 5) -> dict:
+    results = []
+    for _ in range(runs):
+        script = MEASURE_SCRIPT.format(module=module, lazy=LAZY_MODULES)
+        output = run([executable, "-c", script], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    return {
+        "seconds": min(result["seconds"] for result in results),
+        "loaded": results[0]["loaded"],
+    }
+
+def main():
+    failed = False
+    report = {}
+    for module, budget in IMPORT_BUDGETS.items():
+        result = measure_import(module)
+        report[module] = result
+        status = "ok"
+        if result["seconds"] > budget:
+            status = f"OVER BUDGET ({budget:.2f}s)"
+            failed = True
+        if len(result["loaded"]) > 0:
+            status = f"EAGERLY IMPORTS {', '.join(result['loaded'])}"
+            failed = True
+        print(f"{module:<20} {result['seconds'] * 1000:8.1f} ms  {status}")
+
+    print(json.dumps(report))
+    exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Benchmarks each stage of the render pipeline on synthetic scripts of
+increasing size. Every measurement runs in a fresh interpreter so caches
+and peak memory don't leak from one into the next.
+
+    python benchmarks/render_pipeline.py [--sizes 10 100 1000] [--only NAME ...]
+                                         [--output results.json] [--compare old.json]
+
+Times are reported as ms per call (or per frame) percentiles along with
+calls (or frames) per second and the peak resident memory of the process.
+"""
+from subprocess import run
+from sys import executable, exit, platform, path as sys_path
+from os import chdir, remove
+from os.path import dirname, abspath, join, exists
+from time import perf_counter
+from random import Random
+from tempfile import TemporaryDirectory
+import argparse
+import resource
+import json
+
+REPO_DIR = dirname(dirname(abspath(__file__)))
+
+BENCHMARKS = [
+    "get_rich_boxes",
+    "parse_text",
+    "get_best_font",
+    "fit_words_within_width",
+    "scene_render",
+    "set_filepath",
+    "render_audio",
+    "render_movie",
+]
+
+DEFAULT_SIZES = [10, 100, 1000]
+
+# Frames composited per size by `scene_render`, so large scripts stay quick
+MAX_SCENE_FRAMES = 3000
+
+WORDS = [
+    "the", "witness", "is", "lying", "about", "what", "happened", "that", "night",
+    "objection", "your", "honor", "defense", "prosecution", "evidence", "clearly",
+    "shows", "a", "contradiction", "in", "testimony", "I", "saw", "him", "leave",
+    "courtroom", "before", "trial", "began", "decisive", "autopsy", "report",
+]
+
+def make_box(rng: Random) -> str:
+    from tag_macros import (
+        SPR_PHX_NORMAL_T, SPR_PHX_NORMAL_I, SPR_EDW_NORMAL_T, SPR_EDW_NORMAL_I,
+        SLAM_PHX, OBJ_EDW, END_BOX, S_DRAMAPOUND, S_SMACK,
+    )
+    phoenix = rng.random() < 0.5
+    talk, idle = (SPR_PHX_NORMAL_T, SPR_PHX_NORMAL_I) if phoenix else (SPR_EDW_NORMAL_T, SPR_EDW_NORMAL_I)
+    name = "Phoenix" if phoenix else "Edgeworth"
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+    highlight = rng.randrange(len(words))
+    words[highlight] = f"<red>{words[highlight]}</red>"
+    box = f'<nametag "{name}"/><showbox/>{talk}{" ".join(words).capitalize()}.{idle}'
+    effect = rng.random()
+    if effect < 0.1:
+        box = (SLAM_PHX if phoenix else OBJ_EDW) + box
+    elif effect < 0.2:
+        box += S_DRAMAPOUND if phoenix else S_SMACK
+    return box + END_BOX
+
+def make_script(box_count: int, seed: int = 0) -> list[str]:
+    """
+    Deterministic synthetic script of `box_count` text boxes. Long boxes are
+    split over more than one page.
+    """
+    rng = Random(seed)
+    return [make_box(rng) for _ in range(box_count)]
+
+def make_pages(page_count: int, seed: int = 0):
+    from parse_tags import get_rich_boxes
+    rng = Random(seed)
+    pages = []
+    while len(pages) < page_count:
+        pages.extend(get_rich_boxes(make_box(rng), use_spacy=False))
+    return pages[:page_count]
+
+def make_director(page_count: int):
+    from ace_attorney_scene import AceAttorneyDirector
+    director = AceAttorneyDirector()
+    director.set_current_pages(make_pages(page_count))
+    return director
+
+def summarize(samples: list[float]) -> dict:
+    import numpy as np
+    ms = np.array(samples) * 1000
+    total = sum(samples)
+    return {
+        "count": len(samples),
+        "total_s": total,
+        "per_s": len(samples) / total if total > 0 else None,
+        "ms_mean": float(ms.mean()),
+        "ms_p50": float(np.percentile(ms, 50)),
+        "ms_p90": float(np.percentile(ms, 90)),
+        "ms_p99": float(np.percentile(ms, 99)),
+        "ms_max": float(ms.max()),
+    }
+
+def time_calls(function, args_list: list) -> dict:
+    samples = []
+    for args in args_list:
+        start = perf_counter()
+        function(*args)
+        samples.append(perf_counter() - start)
+    return summarize(samples)
+
+def bench_get_rich_boxes(size: int) -> dict:
+    from parse_tags import get_rich_boxes
+    return time_calls(lambda box: get_rich_boxes(box, use_spacy=False), [(box,) for box in make_script(size)])
+
+def bench_parse_text(size: int) -> dict:
+    from parse_tags import parse_text
+    return time_calls(parse_text, [(box,) for box in make_script(size)])
+
+def bench_get_best_font(size: int) -> dict:
+    from font_tools import get_best_font
+    from font_constants import FONT_ARRAY
+    return time_calls(get_best_font, [(page.get_raw_text(), FONT_ARRAY) for page in make_pages(size)])
+
+def bench_fit_words_within_width(size: int) -> dict:
+    from font_tools import fit_words_within_width
+    from font_constants import FONT_ARRAY
+    from MovieKit import load_font
+    font = load_font(FONT_ARRAY[0]["path"], 16)
+    return time_calls(fit_words_within_width, [(page.get_raw_text().split(" "), font, True) for page in make_pages(size)])
+
+def bench_scene_render(size: int) -> dict:
+    director = make_director(size)
+    samples = []
+    while not director.is_done and len(samples) < MAX_SCENE_FRAMES:
+        director.step()
+        start = perf_counter()
+        director.scene.render_frame()
+        samples.append(perf_counter() - start)
+        director.time += 1 / director.fps
+    result = summarize(samples)
+    result["frames_per_s"] = result["per_s"]
+    return result
+
+def bench_set_filepath(size: int) -> dict:
+    from MovieKit import ImageObject
+    from ace_attorney_scene import get_sprite_location
+    rng = Random(0)
+    sprites = [
+        get_sprite_location(character, emotion)
+        for character in ["phoenix", "edgeworth"]
+        for emotion in ["normal-talk", "normal-idle", "deskslam"]
+    ]
+    image = ImageObject(name="Benchmark Image")
+    return time_calls(image.set_filepath, [(rng.choice(sprites),) for _ in range(size)])
+
+def bench_render_audio(size: int) -> dict:
+    director = make_director(size)
+    with TemporaryDirectory() as directory:
+        start = perf_counter()
+        director.render_audio(director.timeline.get_duration(), join(directory, "audio"))
+        result = summarize([perf_counter() - start])
+    result["audio_s"] = director.timeline.get_duration()
+    return result
+
+def bench_render_movie(size: int) -> dict:
+    director = make_director(size)
+    start = perf_counter()
+    output_location = director.render_movie(stream_frames=True)
+    elapsed = perf_counter() - start
+    if exists(output_location):
+        remove(output_location)
+    frames = director.timeline.total_frames
+    return {
+        "count": 1,
+        "total_s": elapsed,
+        "frames": frames,
+        "frames_per_s": frames / elapsed,
+        "ms_per_frame": elapsed * 1000 / frames,
+    }
+
+def get_peak_memory_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if platform == "darwin" else peak / 1024
+
+def run_one(name: str, size: int):
+    chdir(REPO_DIR)
+    sys_path.insert(0, REPO_DIR)
+    result = globals()[f"bench_{name}"](size)
+    result["peak_memory_mb"] = get_peak_memory_mb()
+    print(json.dumps(result))
+
+def measure(name: str, size: int) -> dict:
+    output = run([executable, abspath(__file__), "--run", name, str(size)], cwd=REPO_DIR, capture_output=True, text=True)
+    if output.returncode != 0:
+        lines = output.stderr.strip().splitlines()
+        return {"error": lines[-1] if len(lines) > 0 else f"exit code {output.returncode}"}
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def compare(old: dict, new: dict):
+    for name, sizes in new["results"].items():
+        for size, result in sizes.items():
+            previous = old.get("results", {}).get(name, {}).get(size)
+            if previous is None or "error" in previous or "error" in result:
+                continue
+            change = (result["total_s"] - previous["total_s"]) / previous["total_s"]
+            print(f"{name:<24} {size:>6} pages  {previous['total_s']:9.3f}s -> {result['total_s']:9.3f}s  {change:+7.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the render pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Results JSON from an earlier run to compare against")
+    parser.add_argument("--run", nargs=2, metavar=("NAME", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run is not None:
+        run_one(args.run[0], int(args.run[1]))
+        return
+
+    report = {"sizes": args.sizes, "results": {}}
+    failed = False
+    for name in args.only:
+        report["results"][name] = {}
+        for size in args.sizes:
+            result = measure(name, size)
+            report["results"][name][str(size)] = result
+            if "error" in result:
+                failed = True
+                print(f"{name:<24} {size:>6} pages  ERROR {result['error']}")
+            elif "ms_p50" in result:
+                print(
+                    f"{name:<24} {size:>6} pages  {result['per_s']:10.1f}/s  "
+                    f"p50 {result['ms_p50']:8.3f} ms  p90 {result['ms_p90']:8.3f} ms  p99 {result['ms_p99']:8.3f} ms  "
+                    f"peak {result['peak_memory_mb']:7.1f} MB"
+                )
+            else:
+                print(
+                    f"{name:<24} {size:>6} pages  {result['frames_per_s']:10.1f} frames/s  "
+                    f"{result['ms_per_frame']:8.3f} ms/frame  peak {result['peak_memory_mb']:7.1f} MB"
+                )
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            compare(json.load(f), report)
+    print(json.dumps(report))
+    exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
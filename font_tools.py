@@ -2,15 +2,37 @@ from font_constants import FONT_ARRAY
 from PIL import ImageFont
 from typing import List, Dict, Union
 from textwrap import wrap
-import spacy
+from re import compile
+from functools import lru_cache
 
-nlp = spacy.blank("xx")
-nlp.add_pipe('sentencizer')
+# Loaded on first use by get_sentencizer(), since importing spaCy is slow
+nlp = None
 
-try:
-    from fontTools.ttLib import TTFont
-except:
-    from fonttools.ttLib import TTFont
+def get_sentencizer():
+    global nlp
+    if nlp is None:
+        import spacy
+        nlp = spacy.blank("xx")
+        nlp.add_pipe('sentencizer')
+    return nlp
+
+# A sentence ends at terminal punctuation (plus any closing quotes or
+# brackets), followed by whitespace or the end of the text. Ellipses
+# don't end a sentence.
+sentence_end_re = compile(r"(?:[!?。！？؟][!?.。！？؟]*|(?<!\.)\.(?!\.))[\"'”’)\]]*(?=\s|$)")
+
+def split_sentences_simple(text: str) -> list[str]:
+    """
+    Lightweight alternative to spaCy's sentencizer that splits on terminal
+    punctuation.
+    """
+    sentences = []
+    start = 0
+    for match in sentence_end_re.finditer(text):
+        sentences.append(text[start:match.end()])
+        start = match.end()
+    sentences.append(text[start:])
+    return [sentence.strip() for sentence in sentences if sentence.strip() != ""]
 
 def get_text_width(text, font_size = 15, font = None):
     if font is None:
@@ -19,19 +41,39 @@ def get_text_width(text, font_size = 15, font = None):
     font_obj = ImageFont.truetype(font_path, font_size)
     return font_obj.getlength(text)
 
-def get_font_score(font, text):
+# Font path -> set of codepoints covered by any of the font's cmap tables
+font_coverage: Dict[str, frozenset] = {}
+
+def build_font_coverage_index(font_array = FONT_ARRAY):
+    """
+    Reads the cmap tables of every font in `font_array` once and stores their
+    codepoints in `font_coverage`.
+    """
+    for font in font_array:
+        font_path = font['path']
+        if font_path in font_coverage:
+            continue
+
+        try:
+            from fontTools.ttLib import TTFont
+        except:
+            from fonttools.ttLib import TTFont
+
+        codepoints = set()
+        for table in TTFont(font_path)['cmap'].tables:
+            codepoints.update(table.cmap.keys())
+        font_coverage[font_path] = frozenset(codepoints)
+
+def get_font_coverage(font) -> frozenset:
     font_path = font['path']
-    font = TTFont(font_path)
+    if font_path not in font_coverage:
+        build_font_coverage_index([font])
+    return font_coverage[font_path]
 
+def get_font_score(font, text):
     # We check all chars for presence on the font
-    valid_chars = 0
-    for char in text:
-        # We check if the char is in any table of the font
-        for table in font['cmap'].tables:
-            if ord(char) in table.cmap:
-                valid_chars += 1
-                break
-    return valid_chars
+    coverage = get_font_coverage(font)
+    return sum(1 for char in text if ord(char) in coverage)
 
 def get_best_font(text, font_array):
     best_font = font_array[-1]
@@ -48,19 +90,96 @@ def get_best_font(text, font_array):
     return best_font
 
 
+MAX_WRAP_WIDTH = 240
+
+# Bounded, since batch workers wrap far more distinct words than repeat
+@lru_cache(maxsize=8192)
+def get_cached_length(text: str, font: ImageFont.FreeTypeFont) -> float:
+    return font.getlength(text=text)
+
+def break_long_word(word: str, font: ImageFont.FreeTypeFont) -> list[str]:
+    """
+    Breaks `word` into the fewest pieces narrower than `MAX_WRAP_WIDTH`,
+    taking as many characters as fit into each piece in turn (but always at
+    least one). Newlines in the word always start a new piece.
+    """
+    if "\n" in word:
+        pieces = []
+        *parts, last_part = word.split("\n")
+        for part in parts:
+            pieces.extend(break_long_word(part, font) if len(part) > 0 else [""])
+            # The newline is measured with the piece before it, like any other
+            # character, and starts a line of its own if it doesn't fit
+            if pieces[-1] != "" and font.getlength(text=pieces[-1] + "\n") >= MAX_WRAP_WIDTH:
+                pieces.append("")
+        pieces.extend(break_long_word(last_part, font) if len(last_part) > 0 else [""])
+        return pieces
+
+    pieces = []
+    start = 0
+    while start < len(word):
+        # Binary search for the longest piece starting at `start` that fits
+        low, high = 1, len(word) - start
+        while low < high:
+            mid = (low + high + 1) // 2
+            if font.getlength(text=word[start:start + mid]) < MAX_WRAP_WIDTH:
+                low = mid
+            else:
+                high = mid - 1
+        pieces.append(word[start:start + low])
+        start += low
+    return pieces
+
 def fit_words_within_width(words: Union[list[str], str], font: ImageFont.FreeTypeFont, insert_space: bool):
-    new_text = ""
+    """
+    Joins `words` into lines narrower than `MAX_WRAP_WIDTH`, breaking words
+    that don't fit on a line of their own.
+
+    The width of the current line is tracked by adding up cached word
+    lengths. That ignores kerning between words, so whenever the estimate
+    is close enough to the limit for kerning to matter, the line is
+    measured properly instead.
+    """
+    lines: list[str] = []
     space = " " if insert_space else ""
+    line = ""
+    line_width = 0.0
+    # Number of word boundaries whose kerning the estimate may have missed
+    unmeasured_joins = 0
     for word in words:
-        last_sentence = new_text.split("\n")[-1] + word + space
-        if font.getlength(text=last_sentence) >= 240:
-            if new_text.split("\n")[-1] != "":
-                new_text += "\n"
-            new_text += fit_words_within_width(word, font, False) + space
+        piece = word + space
+        estimate = line_width + get_cached_length(piece, font)
+        margin = font.size * (unmeasured_joins + 1)
+        if "\n" not in piece and estimate < MAX_WRAP_WIDTH - margin:
+            line += piece
+            line_width = estimate
+            unmeasured_joins += 1
+            continue
+        if "\n" not in piece and estimate >= MAX_WRAP_WIDTH + margin:
+            fits = False
+        else:
+            exact_width = font.getlength(text=line + piece)
+            fits = exact_width < MAX_WRAP_WIDTH
+
+        if fits:
+            line += piece
+            if "\n" in line:
+                *finished_lines, line = line.split("\n")
+                lines.extend(finished_lines)
+                exact_width = font.getlength(text=line)
+            line_width = exact_width
+            unmeasured_joins = 0
         else:
-            new_text += word + space
+            if line != "":
+                lines.append(line)
+            *finished_lines, line = break_long_word(word, font) if len(word) > 0 else [""]
+            lines.extend(finished_lines)
+            line += space
+            line_width = font.getlength(text=line)
+            unmeasured_joins = 0
 
-    return new_text
+    lines.append(line)
+    return "\n".join(lines)
 
 def split_str_into_newlines(text: str, font_path, font_size):
     font = ImageFont.truetype(font_path, font_size)
@@ -68,11 +187,17 @@ def split_str_into_newlines(text: str, font_path, font_size):
     return fit_words_within_width(words, font, True)
 
 
-def split_with_joined_sentences(text: str):
+def split_with_joined_sentences(text: str, use_spacy: bool = True):
     """
+    Splits `text` into sentences, joining short neighbouring sentences and
+    wrapping long ones so each piece fits in a dialogue box. With
+    `use_spacy=False`, `split_sentences_simple` is used instead of spaCy.
     """
-    tokens = nlp(text)
-    sentences = [sent.text.strip() for sent in tokens.sents]
+    if use_spacy:
+        tokens = get_sentencizer()(text)
+        sentences = [sent.text.strip() for sent in tokens.sents]
+    else:
+        sentences = split_sentences_simple(text)
     joined_sentences = []
     i = 0
     while i < len(sentences):
@@ -0,0 +1,159 @@
+from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+
+class Glyph:
+    mask: Image.Image
+    offset: tuple[int, int]
+    advance: float
+
+    def __init__(self, mask: Image.Image, offset: tuple[int, int], advance: float):
+        self.mask = mask
+        self.offset = offset
+        self.advance = advance
+        self.mask_array = None
+
+    def get_mask_array(self) -> np.ndarray:
+        if self.mask_array is None:
+            self.mask_array = np.asarray(self.mask)
+        return self.mask_array
+
+    def __repr__(self) -> str:
+        return f"Glyph({self.mask.size}, {self.offset}, {self.advance})"
+
+class GlyphAtlas:
+    """
+    Pre-rasterized glyph coverage masks and advances, keyed by
+    (font path, font size, codepoint). Colour isn't part of the key - it is
+    applied when a glyph is blitted, so each glyph is only rasterized once
+    whatever colour it is drawn in.
+
+    Glyphs are placed the way Pillow's basic layout places them: the pen
+    moves by each glyph's advance plus the kerning between it and the next,
+    in 1/64ths of a pixel, and is rounded to place each glyph. Text drawn
+    from the atlas then matches `ImageDraw.text` pixel for pixel. Text that
+    needs shaping (like right-to-left scripts) should still be drawn
+    through Pillow directly.
+    """
+    def __init__(self):
+        self.glyphs: dict[tuple[str, int, int], Glyph] = {}
+        # (font path, font size, codepoint, next codepoint) -> kerning in
+        # 1/64ths of a pixel
+        self.kerning: dict[tuple[str, int, int, int], int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_glyph(self, font: ImageFont.FreeTypeFont, char: str) -> Glyph:
+        key = (font.path, font.size, ord(char))
+        glyph = self.glyphs.get(key)
+        if glyph is not None:
+            self.hits += 1
+            return glyph
+
+        self.misses += 1
+        left, top, right, bottom = font.getbbox(char, anchor="la")
+        mask = Image.new("L", (max(right - left, 0), max(bottom - top, 0)))
+        if mask.width > 0 and mask.height > 0:
+            ImageDraw.ImageDraw(mask).text((-left, -top), char, font=font, fill=255, anchor="la")
+        glyph = Glyph(mask, (left, top), font.getlength(char))
+        self.glyphs[key] = glyph
+        return glyph
+
+    def get_kerning(self, font: ImageFont.FreeTypeFont, char: str, next_char: str) -> int:
+        key = (font.path, font.size, ord(char), ord(next_char))
+        kerning = self.kerning.get(key)
+        if kerning is None:
+            pair_length = font.getlength(char + next_char)
+            kerning = round((pair_length - self.get_glyph(font, char).advance - self.get_glyph(font, next_char).advance) * 64)
+            self.kerning[key] = kerning
+        return kerning
+
+    def prepare(self, font: ImageFont.FreeTypeFont, text: str):
+        for char in set(text):
+            self.get_glyph(font, char)
+        for char, next_char in set(zip(text, text[1:])):
+            self.get_kerning(font, char, next_char)
+
+    def get_pen_advance(self, text: str, font: ImageFont.FreeTypeFont) -> int:
+        """
+        How far drawing `text` moves the pen, in 1/64ths of a pixel.
+        """
+        advance = 0
+        for i, char in enumerate(text):
+            advance += round(self.get_glyph(font, char).advance * 64)
+            if i > 0:
+                advance += self.get_kerning(font, text[i - 1], char)
+        return advance
+
+    def get_length(self, text: str, font: ImageFont.FreeTypeFont) -> float:
+        return self.get_pen_advance(text, font) / 64
+
+    def layout_text(self, xy: tuple[float, float], text: str, font: ImageFont.FreeTypeFont, anchor: str = "la") -> tuple[list[tuple[Glyph, tuple[int, int]]], tuple[int, int]]:
+        """
+        Places each visible glyph of `text` for `draw_text`. Returns the
+        `(glyph, top left corner)` pairs and the pen position after the text.
+        """
+        x, y = xy
+        if anchor[0] == "r":
+            x -= self.get_length(text, font)
+
+        # Like Pillow, the pen starts at the fractional part of `xy` and is
+        # rounded to whole pixels from its integer part. FreeType's y axis
+        # points up, so halves round up horizontally but down vertically.
+        origin_x, origin_y = int(x), int(y)
+        pen_x = round((x - origin_x) * 64)
+        top = origin_y - ((32 - round((y - origin_y) * 64)) >> 6)
+
+        placed = []
+        for i, char in enumerate(text):
+            glyph = self.get_glyph(font, char)
+            if i > 0:
+                pen_x += self.get_kerning(font, text[i - 1], char)
+            if glyph.mask.width > 0 and glyph.mask.height > 0:
+                left = origin_x + ((pen_x + 32) >> 6)
+                placed.append((glyph, (left + glyph.offset[0], top + glyph.offset[1])))
+            pen_x += round(glyph.advance * 64)
+        return placed, (origin_x + ((pen_x + 32) >> 6), top)
+
+    def get_text_mask(self, xy: tuple[float, float], text: str, font: ImageFont.FreeTypeFont, anchor: str = "la") -> tuple[Image.Image | None, tuple[int, int, int, int]]:
+        """
+        The coverage of `text` combined into one "L" mask, and the bounding
+        box it goes in. Where glyphs overlap, each is laid over the glyphs
+        before it, like Pillow combines them. The mask is None if no glyph
+        has any ink, and the box is then empty at the pen's end position.
+        """
+        placed, (end_x, end_y) = self.layout_text(xy, text, font, anchor)
+        if len(placed) == 0:
+            return None, (end_x, end_y, end_x, end_y)
+
+        left = min(x for _, (x, _) in placed)
+        top = min(y for _, (_, y) in placed)
+        right = max(x + glyph.mask.width for glyph, (x, _) in placed)
+        bottom = max(y + glyph.mask.height for glyph, (_, y) in placed)
+        mask = Image.new("L", (right - left, bottom - top))
+        for glyph, (x, y) in placed:
+            mask.paste(255, (x - left, y - top, x - left + glyph.mask.width, y - top + glyph.mask.height), mask=glyph.mask)
+        return mask, (left, top, right, bottom)
+
+    def draw_text(self, img: Image.Image, xy: tuple[float, float], text: str, font: ImageFont.FreeTypeFont, fill, anchor: str = "la"):
+        """
+        Draws `text` onto `img` like `ImageDraw.text` with a left or right
+        horizontal anchor and an ascender vertical anchor, blending `fill`
+        through the text's combined mask. Returns the bounding box that was
+        drawn.
+        """
+        mask, bbox = self.get_text_mask(xy, text, font, anchor)
+        if mask is not None:
+            img.paste(fill, bbox, mask=mask)
+        return bbox
+
+    def load(self, glyphs: dict[tuple[str, int, int], Glyph], kerning: dict[tuple[str, int, int, int], int] = None):
+        self.glyphs.update(glyphs)
+        if kerning is not None:
+            self.kerning.update(kerning)
+
+# One atlas per process. Worker processes are seeded with the main
+# process's glyphs and kerning when they start.
+glyph_atlas = GlyphAtlas()
+
+def load_glyph_atlas(glyphs: dict[tuple[str, int, int], Glyph], kerning: dict[tuple[str, int, int, int], int] = None):
+    glyph_atlas.load(glyphs, kerning)
@@ -0,0 +1,255 @@
+from PIL import Image, ImageDraw
+from functools import lru_cache
+import numpy as np
+
+def div255(values: np.ndarray) -> np.ndarray:
+    """
+    Divides by 255 with the same rounding Pillow uses when blending. Safe in
+    uint16 for anything up to 255 * 255.
+    """
+    values += 128
+    values += values >> 8
+    values >>= 8
+    return values
+
+class PremultipliedFrame:
+    """
+    A sprite frame prepared for blending with `blend_frame`. Fully
+    transparent borders are trimmed off, and colour is stored multiplied by
+    alpha in uint16 so blending is one multiply-add per channel.
+    """
+    def __init__(self, image: Image.Image):
+        bbox = image.getchannel("A").getbbox()
+        if bbox is None:
+            self.offset = (0, 0)
+            self.rgba = np.zeros((0, 0, 4), dtype=np.uint8)
+        else:
+            self.offset = (bbox[0], bbox[1])
+            self.rgba = np.asarray(image.crop(bbox))
+        alpha = self.rgba[..., 3:4].astype(np.uint16)
+        self.premultiplied = self.rgba.astype(np.uint16) * alpha
+        self.inverse_alpha = 255 - alpha
+        self.opaque = bool((alpha == 255).all())
+
+def clip_region(buffer: np.ndarray, x: int, y: int, w: int, h: int) -> tuple[tuple[slice, slice], tuple[slice, slice]] | None:
+    """
+    Returns the `(buffer slices, source slices)` where a `w` x `h` source
+    placed at (x, y) overlaps the buffer, or None if it doesn't.
+    """
+    left, top = max(x, 0), max(y, 0)
+    right, bottom = min(x + w, buffer.shape[1]), min(y + h, buffer.shape[0])
+    if right <= left or bottom <= top:
+        return None
+    return (
+        (slice(top, bottom), slice(left, right)),
+        (slice(top - y, bottom - y), slice(left - x, right - x)),
+    )
+
+def blend_frame(buffer: np.ndarray, x: int, y: int, frame: PremultipliedFrame):
+    """
+    Same as pasting the frame onto the buffer's image with itself as the mask.
+    """
+    region = clip_region(buffer, x + frame.offset[0], y + frame.offset[1], frame.rgba.shape[1], frame.rgba.shape[0])
+    if region is None:
+        return
+    dst, src = region
+    if frame.opaque:
+        buffer[dst] = frame.rgba[src]
+        return
+    blended = buffer[dst] * frame.inverse_alpha[src]
+    blended += frame.premultiplied[src]
+    buffer[dst] = div255(blended)
+
+@lru_cache(maxsize=None)
+def fill_covers_transparent() -> bool:
+    """
+    Newer versions of Pillow paste a solid colour through a mask onto a
+    fully transparent pixel with the colour at full strength (only alpha
+    is blended). Checked once so the blend matches whichever is installed.
+    """
+    img = Image.new("RGBA", (1, 1))
+    img.paste((255, 255, 255), (0, 0, 1, 1), mask=Image.new("L", (1, 1), 128))
+    return img.getpixel((0, 0))[0] == 255
+
+def blend_fill(buffer: np.ndarray, x: int, y: int, mask: np.ndarray, fill: tuple):
+    """
+    Same as pasting a solid `fill` colour through an L mask.
+    """
+    region = clip_region(buffer, x, y, mask.shape[1], mask.shape[0])
+    if region is None:
+        return
+    dst, src = region
+    color = np.array(tuple(fill) + (255,) * (4 - len(fill)), dtype=np.uint16)
+    target = buffer[dst]
+    alpha = mask[src][..., None].astype(np.uint16)
+    color_alpha = alpha
+    if fill_covers_transparent():
+        color_alpha = np.where((target[..., 3:4] == 0) & (alpha != 0), np.uint16(255), alpha)
+
+    blended = np.empty(target.shape, dtype=np.uint16)
+    blended[..., :3] = target[..., :3] * (255 - color_alpha)
+    blended[..., :3] += color[:3] * color_alpha
+    blended[..., 3:] = target[..., 3:] * (255 - alpha)
+    blended[..., 3:] += color[3] * alpha
+    buffer[dst] = div255(blended)
+
+def clip_buffer(buffer: np.ndarray, clip: tuple[int, int, int, int] | None) -> tuple[np.ndarray, int, int]:
+    """
+    Returns the part of `buffer` inside `clip` (the whole buffer if None)
+    and the frame position of its top left corner.
+    """
+    if clip is None:
+        return buffer, 0, 0
+    left, top, right, bottom = clip
+    return buffer[top:bottom, left:right], left, top
+
+def union_rects(a: tuple[int, int, int, int], b: tuple[int, int, int, int]) -> tuple[int, int, int, int]:
+    if a[0] >= a[2] or a[1] >= a[3]:
+        return b
+    if b[0] >= b[2] or b[1] >= b[3]:
+        return a
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+def rects_overlap(a: tuple[int, int, int, int], b: tuple[int, int, int, int]) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+def draw_with_pillow(object_type: type, state: tuple, buffer: np.ndarray, clip: tuple[int, int, int, int] = None):
+    """
+    Draws through the type's Pillow `draw_render_state` on a copy of the
+    buffer, for anything there is no array drawing for. Only the part inside
+    `clip` is copied back.
+    """
+    img = Image.fromarray(buffer, "RGBA").copy()
+    object_type.draw_render_state(state, img, ImageDraw.ImageDraw(img))
+    view, _, _ = clip_buffer(buffer, clip)
+    view[:] = clip_buffer(np.asarray(img), clip)[0]
+
+def fill_rect(buffer: np.ndarray, fill: tuple, clip: tuple[int, int, int, int] = None):
+    buffer, _, _ = clip_buffer(buffer, clip)
+    buffer[:] = np.array(tuple(fill) + (255,) * (4 - len(fill)), dtype=np.uint8)
+
+class NumpyCompositor:
+    """
+    Composites render snapshots into one reused NumPy frame buffer.
+
+    Object types draw into the buffer with a `draw_render_state_array(state,
+    buffer)` static method. Types without one are drawn through Pillow on a
+    copy of the buffer, so every type still works, just more slowly.
+    """
+    def __init__(self):
+        self.buffers: dict[tuple[int, int], np.ndarray] = {}
+
+    def get_buffer(self, w: int, h: int) -> np.ndarray:
+        buffer = self.buffers.get((w, h))
+        if buffer is None:
+            buffer = np.zeros((h, w, 4), dtype=np.uint8)
+            self.buffers[(w, h)] = buffer
+        else:
+            buffer.fill(0)
+        return buffer
+
+    def draw(self, object_type: type, state: tuple, buffer: np.ndarray):
+        draw_array = getattr(object_type, "draw_render_state_array", None)
+        if draw_array is not None:
+            draw_array(state, buffer)
+        else:
+            draw_with_pillow(object_type, state, buffer)
+
+    def to_image(self, buffer: np.ndarray) -> Image.Image:
+        # Copied out, since the buffer is reused for the next frame
+        return Image.frombytes("RGBA", (buffer.shape[1], buffer.shape[0]), buffer.tobytes())
+
+numpy_compositor = NumpyCompositor()
+
+# Above this share of the frame needing recompositing, the whole frame is
+# composited instead (e.g. while the camera shakes or pans)
+FULL_REDRAW_AREA = 0.5
+
+class DirtyRegionCompositor:
+    """
+    Keeps the previous frame in a NumPy buffer and only composites again the
+    rectangles where objects changed since then.
+
+    Objects are matched between frames by key. Changed, added and removed
+    objects mark the rectangle from their type's
+    `get_render_state_change_bounds` or `get_render_state_bounds` dirty.
+    Those rectangles are cleared and every object overlapping them is drawn
+    again, clipped to them. The whole frame is composited when a change has
+    unknown bounds (like a flash), the stacking order changed, or the dirty
+    area is too big to be worth it.
+    """
+    def __init__(self):
+        self.buffer: np.ndarray = None
+        self.previous: dict[int, tuple[type, tuple]] = None
+        self.previous_keys: list[int] = []
+        self.full_redraws = 0
+        self.partial_redraws = 0
+
+    def render(self, w: int, h: int, keys: list[int], snapshot: list[tuple[type, tuple]]) -> Image.Image:
+        rects = None
+        if self.buffer is not None and self.buffer.shape == (h, w, 4) and self.previous is not None:
+            rects = self.get_dirty_rects(w, h, keys, snapshot)
+
+        if rects is None:
+            self.full_redraws += 1
+            if self.buffer is None or self.buffer.shape != (h, w, 4):
+                self.buffer = np.zeros((h, w, 4), dtype=np.uint8)
+            else:
+                self.buffer.fill(0)
+            for object_type, state in snapshot:
+                numpy_compositor.draw(object_type, state, self.buffer)
+        else:
+            self.partial_redraws += 1
+            for rect in rects:
+                view, _, _ = clip_buffer(self.buffer, rect)
+                view.fill(0)
+                for object_type, state in snapshot:
+                    bounds = object_type.get_render_state_bounds(state)
+                    if bounds is None or rects_overlap(bounds, rect):
+                        object_type.draw_render_state_array(state, self.buffer, rect)
+
+        self.previous = dict(zip(keys, snapshot))
+        self.previous_keys = keys
+        return numpy_compositor.to_image(self.buffer)
+
+    def get_dirty_rects(self, w: int, h: int, keys: list[int], snapshot: list[tuple[type, tuple]]) -> list[tuple[int, int, int, int]] | None:
+        """
+        Rectangles to composite again, or None if the whole frame should be.
+        """
+        current = dict(zip(keys, snapshot))
+        if [key for key in self.previous_keys if key in current] != [key for key in keys if key in self.previous]:
+            return None
+
+        rects = []
+        for key, (object_type, state) in current.items():
+            if getattr(object_type, "draw_render_state_array", None) is None:
+                return None
+            previous = self.previous.get(key)
+            if previous is None:
+                rects.append(object_type.get_render_state_bounds(state))
+            elif previous[1] != state:
+                rects.append(object_type.get_render_state_change_bounds(previous[1], state))
+        for key, (object_type, state) in self.previous.items():
+            if key not in current:
+                rects.append(object_type.get_render_state_bounds(state))
+        if None in rects:
+            return None
+
+        # Clipped to the frame, and overlapping rectangles merged so no
+        # pixel is composited twice
+        merged: list[tuple[int, int, int, int]] = []
+        for left, top, right, bottom in rects:
+            rect = (max(left, 0), max(top, 0), min(right, w), min(bottom, h))
+            if rect[0] >= rect[2] or rect[1] >= rect[3]:
+                continue
+            overlapping = [other for other in merged if rects_overlap(other, rect)]
+            while len(overlapping) > 0:
+                for other in overlapping:
+                    merged.remove(other)
+                    rect = union_rects(rect, other)
+                overlapping = [other for other in merged if rects_overlap(other, rect)]
+            merged.append(rect)
+
+        if sum((right - left) * (bottom - top) for left, top, right, bottom in merged) > w * h * FULL_REDRAW_AREA:
+            return None
+        return merged
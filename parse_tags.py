@@ -1,7 +1,9 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass
+from functools import cached_property
 from re import compile
 from typing import Union
 from copy import deepcopy
+from shlex import split
 from font_tools import get_best_font, split_str_into_newlines, split_with_joined_sentences
 from font_constants import FONT_ARRAY
 
@@ -28,6 +30,12 @@ class DialogueAction(BaseDialogueItem):
         self.name = name
         self.index = index
 
+    @cached_property
+    def args(self) -> list[str]:
+        # Split when the action is first run rather than when it's parsed,
+        # so a malformed action only fails once it's reached
+        return split(self.name)
+
     def __repr__(self) -> str:
         return f"DialogueAction(\'{self.name}\', {self.index})"
 
@@ -37,7 +45,7 @@ class DialogueTextLineBreak(BaseDialogueItem):
 
 class DialogueTextChunk(BaseDialogueItem):
     text: str = ""
-    tags: list[str] = field(default_factory=list)
+    tags: list[str]
     position: int = 0
 
     def __init__(self, text: str, tags: list[str]):
@@ -60,6 +68,12 @@ class DialoguePage:
     def __repr__(self) -> str:
         return f"DialoguePage({self.commands})"
 
+    def reset_progress(self):
+        for command in self.commands:
+            command.completed = False
+            if isinstance(command, DialogueTextChunk):
+                command.position = 0
+
     def get_current_item(self):
         for command in self.commands:
             if not command.completed:
@@ -73,6 +87,36 @@ class DialoguePage:
                 lens.append(len(command))
         return sum(lens)
 
+    def get_content_data(self) -> list:
+        """
+        JSON-serializable description of this page's content, for hashing.
+        """
+        data = []
+        for command in self.commands:
+            if isinstance(command, DialogueTextChunk):
+                data.append(["text", command.text, command.tags])
+            elif isinstance(command, DialogueAction):
+                data.append(["action", command.name])
+            elif isinstance(command, DialogueTextLineBreak):
+                data.append(["linebreak"])
+        return data
+
+    @classmethod
+    def from_content_data(cls, data: list) -> 'DialoguePage':
+        """
+        Rebuilds a page from the output of `get_content_data`.
+        """
+        commands = []
+        for command in data:
+            match command:
+                case ["text", text, tags]:
+                    commands.append(DialogueTextChunk(text, list(tags)))
+                case ["action", name]:
+                    commands.append(DialogueAction(name, 0))
+                case ["linebreak"]:
+                    commands.append(DialogueTextLineBreak())
+        return cls(commands)
+
     def get_raw_text(self) -> str:
         texts = []
         for command in self.commands:
@@ -141,9 +185,7 @@ class DialoguePage:
         if len(current_string) > 0:
             chunks.append(DialogueTextChunk(current_string, current_tags))
 
-        d = DialoguePage(chunks)
-        print("condensed chunks:", d)
-        return d
+        return DialoguePage(chunks)
 
 @dataclass
 class DialogueTextContent:
@@ -151,32 +193,64 @@ class DialogueTextContent:
     tags: list[DialogueTag]
     actions: list[DialogueAction]
 
-    def get_text_chunks(self) -> list[DialoguePage]:
+    def get_text_chunks(self, use_spacy: bool = True) -> list[DialoguePage]:
+        # Index actions by position, and tag starts/ends so the tags active at
+        # each position can be tracked with a sweep instead of checking every tag
+        actions_at: dict[int, list[DialogueAction]] = {}
+        for action in self.actions:
+            actions_at.setdefault(action.index, []).append(action)
+
+        tags_starting_at: dict[int, list[int]] = {}
+        tags_ending_at: dict[int, list[int]] = {}
+        for i, tag in enumerate(self.tags):
+            if tag.start < tag.end:
+                tags_starting_at.setdefault(tag.start, []).append(i)
+                tags_ending_at.setdefault(tag.end, []).append(i)
+
+        active_tags: set[int] = set()
+        current_tags: list[str] = []
+
         pages = []
         current_position = 0
-        for box_text in split_with_joined_sentences(self.cleaned_lines):
+        for box_text in split_with_joined_sentences(self.cleaned_lines, use_spacy):
             splitter_font_path = get_best_font(box_text, FONT_ARRAY)['path']
             wrapped_box_lines = split_str_into_newlines(box_text, splitter_font_path, 15).split('\n')
-            chunks: list[list[DialogueTextChunk]] = []
+            chunks: list[BaseDialogueItem] = []
+
+            # Characters are gathered into runs that share the same tags, so
+            # chunks come out already merged
+            run: list[str] = []
+            run_tags: list[str] = None
+
+            def end_run():
+                nonlocal run, run_tags
+                if len(run) > 0:
+                    chunks.append(DialogueTextChunk(''.join(run), run_tags))
+                run = []
+                run_tags = None
 
             for line in wrapped_box_lines:
                 for char in line:
-                    # print(f"Processing char {char} at position {current_position}")
                     # First, process actions
-                    for action in [a for a in self.actions if a.index == current_position]:
-                        # print(f"Action {action} takes place at this position, so insert it")
-                        chunks.append(action)
-
-                    this_char_tags: list[str] = []
-                    for tag in self.tags:
-                        if current_position in tag.range():
-                            this_char_tags.append(tag.name)
-                    chunks.append(DialogueTextChunk(char, this_char_tags))
+                    if current_position in actions_at:
+                        end_run()
+                        chunks.extend(actions_at[current_position])
+
+                    if current_position in tags_starting_at or current_position in tags_ending_at:
+                        active_tags.difference_update(tags_ending_at.get(current_position, []))
+                        active_tags.update(tags_starting_at.get(current_position, []))
+                        current_tags = [self.tags[i].name for i in sorted(active_tags)]
+
+                    if run_tags is not None and current_tags != run_tags:
+                        end_run()
+                    if run_tags is None:
+                        run_tags = current_tags.copy()
+                    run.append(char)
                     current_position += 1
 
+                end_run()
                 chunks.append(DialogueTextLineBreak())
-            new_page = DialoguePage(chunks).condense_chunks()
-            pages.append(new_page)
+            pages.append(DialoguePage(chunks))
             
         return pages
 
@@ -191,12 +265,18 @@ def parse_text(text: str) -> DialogueTextContent:
     tag_stack = []
     final_tags = []
     final_actions = []
-    stripped_text = text
-    
-    next_match = tag_re.search(stripped_text)
-    while next_match is not None:
-        start, end = next_match.span(0)
-        stripped_text = stripped_text[:start] + stripped_text[end:]
+    stripped_pieces = []
+
+    # Tags are found in a single pass over the original text. `start` is
+    # where each tag would be in the text with all previous tags removed.
+    last_end = 0
+    removed_length = 0
+    for next_match in tag_re.finditer(text):
+        match_start, match_end = next_match.span(0)
+        stripped_pieces.append(text[last_end:match_start])
+        start = match_start - removed_length
+        removed_length += match_end - match_start
+        last_end = match_end
 
         closing_slash, tag_name, self_closing_slash = next_match.group(1, 2, 3)
         is_closing_tag = closing_slash == "/"
@@ -234,7 +314,9 @@ def parse_text(text: str) -> DialogueTextContent:
                 "name": tag_name,
                 "index": start
             })
-        next_match = tag_re.search(stripped_text)
+
+    stripped_pieces.append(text[last_end:])
+    stripped_text = "".join(stripped_pieces)
 
     # Construct list of tags and actions
     tag_objects = []
@@ -247,9 +329,10 @@ def parse_text(text: str) -> DialogueTextContent:
 
     return DialogueTextContent(stripped_text, tag_objects, action_objects)
 
-def get_rich_boxes(text: str):
+def get_rich_boxes(text: str, use_spacy: bool = True):
     """
     Given input `text`, returns a list of `DialoguePage` objects. Each object
-    represents a single dialogue box.
+    represents a single dialogue box. With `use_spacy=False`, sentences are
+    split without loading spaCy.
     """
-    return parse_text(text).get_text_chunks()
+    return parse_text(text).get_text_chunks(use_spacy)
@@ -0,0 +1,137 @@
+from time import perf_counter_ns
+from contextlib import nullcontext
+from functools import wraps
+from threading import Lock, get_ident
+from os import getpid
+import json
+
+class Span:
+    def __init__(self, profiler: 'Profiler', name: str, category: str):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = perf_counter_ns()
+        self.profiler.add_time(self.name, self.category, end - self.start)
+        self.profiler.trace_events.append((self.name, self.category, self.start, end - self.start, get_ident()))
+
+# Returned by `Profiler.span` while profiling is off, so disabled spans cost
+# one attribute check and an empty `with`
+NO_SPAN = nullcontext()
+
+class Profiler:
+    """
+    Collects how long each phase of a render takes, along with counters,
+    and exports them as a JSON summary or a Chrome trace (load it in
+    chrome://tracing or Perfetto). Disabled until `enable` is called.
+
+    Only work done in this process is recorded, so compositing done by
+    render workers shows up as time spent waiting for them.
+    """
+    def __init__(self):
+        self.enabled = False
+        # Spans can end on writer threads as well as the main one
+        self.lock = Lock()
+        self.reset()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        # name -> [category, count, total ns, max ns]
+        self.totals: dict[str, list] = {}
+        self.counters: dict[str, int] = {}
+        # (name, category, start ns, duration ns, thread id)
+        self.trace_events: list[tuple[str, str, int, int, int]] = []
+
+    def span(self, name: str, category: str = "phase"):
+        """
+        Context manager timing the code inside it as one `name` span.
+        """
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, name, category)
+
+    def add_time(self, name: str, category: str, duration_ns: int):
+        """
+        Adds to the totals for `name` without recording a trace event, for
+        things that happen too often to trace one by one.
+        """
+        with self.lock:
+            total = self.totals.get(name)
+            if total is None:
+                self.totals[name] = [category, 1, duration_ns, duration_ns]
+            else:
+                total[1] += 1
+                total[2] += duration_ns
+                total[3] = max(total[3], duration_ns)
+
+    def count(self, name: str, amount: int = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_counter(self, name: str, value: int):
+        if self.enabled:
+            self.counters[name] = value
+
+    def get_summary(self) -> dict:
+        phases = {}
+        for name, (category, count, total_ns, max_ns) in sorted(self.totals.items(), key=lambda item: -item[1][2]):
+            phases[name] = {
+                "category": category,
+                "count": count,
+                "total_ms": total_ns / 1e6,
+                "mean_ms": total_ns / count / 1e6,
+                "max_ms": max_ns / 1e6,
+            }
+        return {"phases": phases, "counters": dict(self.counters)}
+
+    def export_summary(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.get_summary(), f, indent=2)
+
+    def export_chrome_trace(self, path: str):
+        pid = getpid()
+        events = [
+            {"name": name, "cat": category, "ph": "X", "ts": start / 1000, "dur": duration / 1000, "pid": pid, "tid": tid}
+            for name, category, start, duration, tid in self.trace_events
+        ]
+        if len(self.trace_events) > 0:
+            end = max(start + duration for _, _, start, duration, _ in self.trace_events)
+            events.extend(
+                {"name": name, "ph": "C", "ts": end / 1000, "pid": pid, "args": {name: value}}
+                for name, value in self.counters.items()
+            )
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def print_summary(self):
+        for name, phase in self.get_summary()["phases"].items():
+            print(f"{name:<32} {phase['count']:>8}  {phase['total_ms']:10.1f} ms total  {phase['mean_ms']:8.3f} ms mean")
+        for name, value in self.counters.items():
+            print(f"{name:<32} {value:>8}")
+
+# One profiler per process, shared by everything that renders
+profiler = Profiler()
+
+def profiled(name: str, category: str = "phase"):
+    """
+    Decorator timing every call of a function as a `name` span.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            with profiler.span(name, category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,122 @@
+from hashlib import sha256
+from os import makedirs, listdir, remove, replace, utime, close
+from os.path import exists, getsize, getmtime, join
+from shutil import copyfile
+from tempfile import mkstemp
+from uuid import uuid4
+import json
+
+def hash_file(path: str) -> str:
+    if not exists(path):
+        return "missing"
+    digest = sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def hash_content(data) -> str:
+    """
+    Hashes any JSON-serializable `data`. Keys are sorted so equal data
+    always gives the same hash.
+    """
+    return sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+class RenderCache:
+    """
+    On-disk cache of rendered files, keyed by a content hash. Entries are
+    evicted least-recently-used first (by modification time, which is
+    updated on every hit) once the cache is over `max_bytes`.
+
+    Several processes can share the directory. Entries are moved into place
+    whole, so an entry is never read half-written.
+
+    Hit and miss counts are kept for this instance in `hits` and `misses`.
+    Each instance writes its counts to a stats file of its own, and
+    `get_stats` adds up every instance's file for totals across processes.
+    """
+    def __init__(self, directory: str = "render-cache", max_bytes: int = 2 * 1024 * 1024 * 1024, extension: str = "mp4"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self.hits = 0
+        self.misses = 0
+        self.stats_path = join(self.directory, f"stats-{uuid4().hex}.json")
+        makedirs(self.directory, exist_ok=True)
+
+    def get_entry_path(self, key: str) -> str:
+        return join(self.directory, f"{key}.{self.extension}")
+
+    def get(self, key: str, output_location: str) -> bool:
+        """
+        Copies the entry for `key` to `output_location` and returns True, or
+        returns False if there is no such entry.
+        """
+        entry_path = self.get_entry_path(key)
+        try:
+            utime(entry_path)
+            copyfile(entry_path, output_location)
+        except FileNotFoundError:
+            # Never written, or evicted by another process
+            self.misses += 1
+            self.record()
+            return False
+
+        self.hits += 1
+        self.record()
+        return True
+
+    def put(self, key: str, source_location: str):
+        # Copied under a temporary name first, since other processes may be
+        # reading the entry's final name
+        handle, temp_path = mkstemp(dir=self.directory, suffix=".partial")
+        close(handle)
+        try:
+            copyfile(source_location, temp_path)
+            replace(temp_path, self.get_entry_path(key))
+        except BaseException:
+            remove(temp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        entries = [join(self.directory, name) for name in listdir(self.directory) if name.endswith(f".{self.extension}")]
+        entries.sort(key=getmtime)
+        total_bytes = sum(getsize(entry) for entry in entries)
+        # Always keep the newest entry, even if it's bigger than the cache
+        while total_bytes > self.max_bytes and len(entries) > 1:
+            oldest = entries.pop(0)
+            total_bytes -= getsize(oldest)
+            try:
+                remove(oldest)
+            except FileNotFoundError:
+                # Another process evicted it first
+                pass
+
+    def get_stats(self) -> dict:
+        stats = {"hits": 0, "misses": 0}
+        for name in listdir(self.directory):
+            if not (name.startswith("stats") and name.endswith(".json")):
+                continue
+            try:
+                with open(join(self.directory, name), 'r') as f:
+                    file_stats = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for counter in stats:
+                stats[counter] += file_stats.get(counter, 0)
+        return stats
+
+    def record(self):
+        # Only this instance writes its stats file, so nothing is lost to
+        # another process writing at the same time. Replaced whole so
+        # readers never see it half-written.
+        handle, temp_path = mkstemp(dir=self.directory, suffix=".partial")
+        with open(handle, 'w') as f:
+            json.dump({"hits": self.hits, "misses": self.misses}, f)
+        replace(temp_path, self.stats_path)
+
+    def get_hit_rate(self) -> float:
+        stats = self.get_stats()
+        total = stats["hits"] + stats["misses"]
+        return stats["hits"] / total if total > 0 else 0.0
@@ -0,0 +1,214 @@
+"""
+Splits one render across several machines sharing a directory.
+
+A manifest describing the script, its shards (runs of whole segments) and
+the scene state each shard starts from is written to the directory. Any
+number of workers then claim shards and render them to segment files, and
+a merge step stitches the segments together and mixes the audio once.
+
+    python render_shards.py worker <directory> [compositing workers]
+    python render_shards.py merge <directory> <output location>
+
+A worker whose render fails gives its shard back, so the next worker to
+run picks it up. A worker that dies outright (killed, or its machine lost)
+can't, and its shard stays claimed: once it's certain the worker is gone,
+delete that shard's `.claim` file and start a worker to render it.
+"""
+from os import O_CREAT, O_EXCL, O_WRONLY, open as open_file, close, makedirs, remove, replace
+from os.path import exists, join
+from subprocess import Popen
+from importlib import import_module
+from sys import argv, executable, exit
+import json
+from MovieKit import Director, group_by_frames
+from render_cache import hash_file, hash_content
+from profiling import profiler
+
+MANIFEST_VERSION = 1
+
+def plan_shards(segments: list[tuple[int, int]], shard_count: int) -> list[tuple[int, int]]:
+    """
+    Groups consecutive segments into at most `shard_count` shards with
+    roughly the same number of frames each.
+    """
+    groups = group_by_frames(segments, shard_count, lambda segment: segment[1] - segment[0])
+    return [(group[0][0], group[-1][1]) for group in groups]
+
+def get_shard_name(index: int) -> str:
+    return f"shard-{index:05d}.mp4"
+
+def write_manifest(director: Director, directory: str, shard_count: int, volume_adjustment: float = 0.0) -> str:
+    """
+    Plans the shards for `director` and writes the manifest to `directory`,
+    returning its location. The director is stepped through the whole movie
+    (without rendering) to record the scene state at each shard boundary.
+    """
+    segments = director.get_segments()
+    script_data = director.get_script_data()
+    if segments is None or script_data is None:
+        raise Exception(f"{type(director).__name__} can't be rendered in shards")
+
+    makedirs(directory, exist_ok=True)
+    director.time = 0.0
+    director.is_done = False
+    asset_hashes = {path: hash_file(path) for path in sorted(director.get_referenced_assets())}
+
+    shards = []
+    frame = 0
+    for index, (start, end) in enumerate(plan_shards(segments, shard_count)):
+        director.advance(start - frame)
+        frame = start
+        entry_state = director.get_state_data()
+        shards.append({
+            "index": index,
+            "start": start,
+            "end": end,
+            "key": director.get_segment_key(start, end, asset_hashes),
+            "entry_state": entry_state,
+            "entry_state_hash": hash_content(entry_state),
+        })
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "director": [type(director).__module__, type(director).__qualname__],
+        "script": script_data,
+        "volume_adjustment": volume_adjustment,
+        "total_frames": segments[-1][1] if len(segments) > 0 else 0,
+        "assets": asset_hashes,
+        "shards": shards,
+    }
+    manifest_location = join(directory, "manifest.json")
+    with open(manifest_location, "w") as f:
+        json.dump(manifest, f)
+    return manifest_location
+
+def load_manifest(directory: str) -> dict:
+    with open(join(directory, "manifest.json"), "r") as f:
+        manifest = json.load(f)
+    if manifest["version"] != MANIFEST_VERSION:
+        raise Exception(f"Manifest version {manifest['version']} isn't supported (expected {MANIFEST_VERSION})")
+    return manifest
+
+def create_director(manifest: dict) -> Director:
+    module_name, class_name = manifest["director"]
+    director_class = getattr(import_module(module_name), class_name)
+    return director_class.from_script_data(manifest["script"])
+
+def check_assets(manifest: dict):
+    for path, expected in manifest["assets"].items():
+        if hash_file(path) != expected:
+            raise Exception(f"Asset {path} differs from the one the manifest was planned with")
+
+def claim_shard(directory: str, index: int) -> bool:
+    """
+    Atomically marks shard `index` as taken. Returns False if another
+    worker already claimed it.
+    """
+    try:
+        close(open_file(join(directory, f"{get_shard_name(index)}.claim"), O_CREAT | O_EXCL | O_WRONLY))
+        return True
+    except FileExistsError:
+        return False
+
+def release_shard(directory: str, index: int):
+    """
+    Gives up the claim on shard `index` so another worker can render it.
+    """
+    for location in [f"{get_shard_name(index)}.claim", f"partial-{get_shard_name(index)}"]:
+        try:
+            remove(join(directory, location))
+        except FileNotFoundError:
+            pass
+
+def render_shard(directory: str, manifest: dict, index: int, workers: int = 1) -> str:
+    shard = manifest["shards"][index]
+    director = create_director(manifest)
+    director.time = 0.0
+    director.is_done = False
+    director.advance(shard["start"])
+
+    # Catches workers whose code or assets don't match the planner's
+    if hash_content(director.get_state_data()) != shard["entry_state_hash"]:
+        raise Exception(f"Scene state at the start of shard {index} doesn't match the manifest")
+
+    # Written under another name first so the merge never sees a partial file
+    location = join(directory, get_shard_name(index))
+    partial_location = join(directory, f"partial-{get_shard_name(index)}")
+    director.render_segment(partial_location, shard["end"] - shard["start"], workers)
+    replace(partial_location, location)
+    return location
+
+def run_worker(directory: str, workers: int = 1) -> list[int]:
+    """
+    Worker entry point. Claims and renders shards from the manifest in
+    `directory` until none are left, returning the indices it rendered.
+    """
+    manifest = load_manifest(directory)
+    check_assets(manifest)
+    rendered = []
+    for shard in manifest["shards"]:
+        if claim_shard(directory, shard["index"]):
+            try:
+                render_shard(directory, manifest, shard["index"], workers)
+            except BaseException:
+                release_shard(directory, shard["index"])
+                raise
+            rendered.append(shard["index"])
+    return rendered
+
+def merge_shards(directory: str, output_location: str) -> str:
+    """
+    Concatenates every rendered shard and muxes in audio mixed once for the
+    whole movie.
+    """
+    import ffmpeg
+    manifest = load_manifest(directory)
+    missing = [shard["index"] for shard in manifest["shards"] if not exists(join(directory, get_shard_name(shard["index"])))]
+    if len(missing) > 0:
+        raise Exception(f"Shards {missing} haven't been rendered yet")
+
+    concat_location = join(directory, "shards.txt")
+    with open(concat_location, "w") as f:
+        f.writelines(f"file '{get_shard_name(shard['index'])}'\n" for shard in manifest["shards"])
+    video_location = join(directory, "video.mp4")
+
+    def concat_shards() -> int:
+        stream = ffmpeg.input(concat_location, format="concat", safe=0)
+        stream = ffmpeg.output(stream, video_location, c="copy")
+        stream = ffmpeg.overwrite_output(stream)
+        with profiler.span("ffmpeg"):
+            ffmpeg.run(stream)
+        return manifest["total_frames"]
+
+    # The audio is mixed while the shards are concatenated
+    director = create_director(manifest)
+    _, audio_location = director.render_audio_alongside(concat_shards, join(directory, "audio"), manifest["volume_adjustment"])
+    director.mux_audio(video_location, audio_location, output_location)
+    return output_location
+
+def render_locally(director: Director, directory: str, node_count: int, volume_adjustment: float = 0.0, output_location: str = None) -> str:
+    """
+    Renders `director` the way a cluster would, with `node_count` separate
+    worker processes standing in for machines that share `directory`.
+    """
+    write_manifest(director, directory, node_count, volume_adjustment)
+    nodes = [Popen([executable, __file__, "worker", directory]) for _ in range(node_count)]
+    for node in nodes:
+        if node.wait() != 0:
+            raise Exception(f"Worker exited with code {node.returncode}")
+    return merge_shards(directory, output_location if output_location is not None else join(directory, "output.mp4"))
+
+def main():
+    match argv[1:]:
+        case ["worker", directory]:
+            print(f"Rendered shards {run_worker(directory)}")
+        case ["worker", directory, workers]:
+            print(f"Rendered shards {run_worker(directory, int(workers))}")
+        case ["merge", directory, output_location]:
+            print(merge_shards(directory, output_location))
+        case _:
+            print(__doc__)
+            exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+from os import makedirs
+from os.path import dirname, abspath, join
+from sys import path as sys_path
+sys_path.insert(0, dirname(dirname(abspath(__file__))))
+
+import pytest
+from PIL import Image, ImageFont
+from font_constants import FONT_ARRAY
+from ace_attorney_scene import AceAttorneyDirector
+from parse_tags import get_rich_boxes
+
+def save_image(path: str, size: tuple[int, int], color: tuple):
+    makedirs(dirname(path), exist_ok=True)
+    Image.new("RGBA", size, color).save(path)
+
+@pytest.fixture
+def ace_attorney_assets(tmp_path, monkeypatch):
+    """
+    Placeholder versions of the assets `AceAttorneyDirector` loads, in a
+    temporary directory that is made the working directory. Every font is
+    Pillow's default font, and every image is a solid colour.
+    """
+    monkeypatch.chdir(tmp_path)
+    font_bytes = ImageFont.load_default(16).path.getvalue()
+    for font_path in [font["path"] for font in FONT_ARRAY] + ["new_assets/textbox/font/ace-name/ace-name.ttf"]:
+        makedirs(dirname(font_path), exist_ok=True)
+        with open(font_path, "wb") as f:
+            f.write(font_bytes)
+
+    save_image("new_assets/bg/bg_main.png", (1290, 192), (40, 60, 90, 255))
+    save_image("new_assets/textbox/mainbox.png", (256, 64), (0, 0, 80, 200))
+    save_image("new_assets/textbox/arrow.gif", (15, 15), (255, 255, 255, 255))
+    for part in ["left", "center", "right"]:
+        save_image(f"new_assets/textbox/nametag_{part}.png", (1, 11), (120, 120, 255, 255))
+    for exclamation in ["objection", "holdit", "takethat"]:
+        save_image(f"new_assets/exclamations/{exclamation}.gif", (256, 192), (255, 0, 0, 255))
+    for character in ["phoenix", "edgeworth"]:
+        for emotion in ["normal-idle", "normal-talk", "sweating-idle", "sweating-talk", "deskslam"]:
+            save_image(join("new_assets/character_sprites", character, f"{character}-{emotion}.gif"), (256, 192), (200, 100, 50, 255))
+    return tmp_path
+
+@pytest.fixture
+def make_director(ace_attorney_assets):
+    """
+    Makes an `AceAttorneyDirector` ready to play the given script boxes,
+    with the placeholder assets.
+    """
+    def make(*boxes: str) -> AceAttorneyDirector:
+        director = AceAttorneyDirector()
+        pages = []
+        for box in boxes:
+            pages.extend(get_rich_boxes(box, use_spacy=False))
+        director.set_current_pages(pages)
+        return director
+    return make
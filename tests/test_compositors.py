@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageFont
+from MovieKit import Scene, SceneObject, ImageObject, SimpleTextObject, render_snapshot
+from ace_attorney_scene import ColorOverlayObject, DialogueBox
+from tag_macros import SPR_PHX_NORMAL_T, SPR_PHX_NORMAL_I, OBJ_EDW, END_BOX, S_DRAMAPOUND
+
+W, H = 256, 192
+
+def assert_compositors_match(snapshot: list[tuple[type, tuple]]):
+    pillow = render_snapshot(W, H, snapshot, "pillow")
+    numpy = render_snapshot(W, H, snapshot, "numpy")
+    assert pillow.tobytes() == numpy.tobytes()
+
+def save_translucent_sprite(path: str):
+    # Every alpha from 0 to 255 over a colour gradient
+    alpha = np.tile(np.arange(256, dtype=np.uint8), (64, 1))
+    rgba = np.stack([alpha, alpha[:, ::-1], np.full_like(alpha, 90), alpha], axis=-1)
+    Image.fromarray(rgba, "RGBA").save(path)
+
+def save_font(path: str) -> tuple[str, int]:
+    with open(path, "wb") as f:
+        f.write(ImageFont.load_default(16).path.getvalue())
+    return (path, 16)
+
+def test_translucent_sprites_over_nothing_and_each_other(tmp_path):
+    sprite = str(tmp_path / "sprite.png")
+    save_translucent_sprite(sprite)
+    assert_compositors_match([
+        # Partly off screen, over transparent pixels
+        (ImageObject, (sprite, None, -40, 10, None, None)),
+        # Over the first sprite, and scaled
+        (ImageObject, (sprite, None, 30, 40, 200, 100)),
+    ])
+
+def test_text_over_transparent_and_translucent_pixels(tmp_path):
+    sprite = str(tmp_path / "sprite.png")
+    save_translucent_sprite(sprite)
+    font_key = save_font(str(tmp_path / "font.ttf"))
+    assert_compositors_match([
+        (SimpleTextObject, (4, 2, "Over nothing at all", font_key)),
+        (ImageObject, (sprite, None, 0, 100, None, None)),
+        (SimpleTextObject, (3, 120, "Hold it! Over the gradient, wavy text", font_key)),
+    ])
+
+def test_colour_overlay(tmp_path):
+    sprite = str(tmp_path / "sprite.png")
+    save_translucent_sprite(sprite)
+    assert_compositors_match([
+        (ImageObject, (sprite, None, 0, 0, None, None)),
+        (ColorOverlayObject, ((255, 255, 255),)),
+        (ImageObject, (sprite, None, 0, 100, None, None)),
+    ])
+
+# The placeholder text box is translucent, and the dialogue and name tag are
+# drawn over it. The drama pound flashes the colour overlay and shakes the
+# scene with the director's seeded RNG
+BOX = f'<nametag "Phoenix"/><showbox/>{SPR_PHX_NORMAL_T}The witness is lying!{SPR_PHX_NORMAL_I}{S_DRAMAPOUND}{OBJ_EDW}Objection!{END_BOX}'
+
+def test_director_frames_match(make_director):
+    director = make_director(BOX)
+    drawn_types = set()
+    for _ in range(director.timeline.total_frames):
+        director.advance(1)
+        snapshot = director.scene.get_render_snapshot()
+        drawn_types.update(object_type for object_type, _ in snapshot)
+        assert_compositors_match(snapshot)
+    assert {DialogueBox, SimpleTextObject, ColorOverlayObject} <= drawn_types
+
+def test_dirty_regions_in_worker_processes(make_director):
+    expected = [img.tobytes() for img in make_director(BOX).render_frames()]
+    director = make_director(BOX)
+    director.scene = Scene(W, H, director.root, compositor="numpy", dirty_regions=True)
+    assert [img.tobytes() for img in director.render_frames(workers=2)] == expected
+
+def test_process_pool_frames_match_sequential_frames(make_director):
+    expected = [img.tobytes() for img in make_director(BOX).render_frames()]
+    assert [img.tobytes() for img in make_director(BOX).render_frames(workers=3)] == expected
+
+def test_objects_that_only_override_render_raise():
+    class RedBox(SceneObject):
+        def render(self, img, ctx):
+            ctx.rectangle((0, 0, 9, 9), fill=(255, 0, 0))
+
+    class Outlined(ImageObject):
+        def render(self, img, ctx):
+            super().render(img, ctx)
+
+    for object_type in [RedBox, Outlined]:
+        root = SceneObject(name="Root")
+        object_type(parent=root, name="Custom")
+        scene = Scene(W, H, root)
+        with pytest.raises(Exception, match=f"{object_type.__name__} overrides render"):
+            scene.render_frame()
@@ -0,0 +1,128 @@
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from ace_attorney_scene import DialogueTextLayer
+
+WHITE = (255, 255, 255)
+RED = (240, 112, 56)
+BLUE = (104, 192, 240)
+
+# (line_no, text, fill) for each chunk of a page, in reveal order
+CHUNKS = [
+    (0, "Hold it, ", WHITE),
+    (0, "that's", RED),
+    (1, " not what the ", WHITE),
+    (1, "autopsy", BLUE),
+    (2, " says!", WHITE),
+]
+
+def get_typed_runs(chars_visible: int) -> tuple:
+    """
+    Runs the way `DialogueBox.get_render_state` gives them with
+    `chars_visible` characters of the page revealed.
+    """
+    runs = []
+    for line_no, text, fill in CHUNKS:
+        shown = min(len(text), max(chars_visible, 0))
+        runs.append((line_no, text[:shown], fill))
+        chars_visible -= len(text)
+    return tuple(runs)
+
+FONT = ImageFont.load_default(16)
+
+def make_layer(use_rtl: bool = False) -> DialogueTextLayer:
+    return DialogueTextLayer((256, 192), 0, 128, use_rtl, 16, FONT)
+
+def make_background() -> Image.Image:
+    return Image.new("RGBA", (256, 192), (20, 40, 60, 255))
+
+def draw_layer(layer: DialogueTextLayer) -> Image.Image:
+    img = make_background()
+    layer.draw(img)
+    return img
+
+def draw_runs_directly(runs: tuple, use_rtl: bool = False) -> Image.Image:
+    """
+    Draws each run straight onto the frame with `ImageDraw.text`, the way
+    the dialogue box drew text before it kept a layer.
+    """
+    img = make_background()
+    ctx = ImageDraw.ImageDraw(img)
+    line_start = 220 if use_rtl else 0
+    x_offset = line_start
+    previous_line_no = 0
+    for line_no, text, fill in runs:
+        if line_no != previous_line_no:
+            x_offset = line_start
+            previous_line_no = line_no
+        xy = (10 + x_offset, 4 + 128 + 16 * line_no)
+        ctx.text(xy, text, fill=fill, font=FONT, anchor=("r" if use_rtl else "l") + "a")
+        length = ctx.textlength(text, font=FONT)
+        x_offset += -length if use_rtl else length
+    return img
+
+def assert_same_image(a: Image.Image, b: Image.Image):
+    # The frames are opaque, and an RGBA difference's bbox only looks at alpha
+    assert np.array_equal(np.asarray(a), np.asarray(b))
+
+def test_typing_across_chunks_never_rebuilds_the_layer(monkeypatch):
+    clears = []
+    original_clear = DialogueTextLayer.clear
+    monkeypatch.setattr(DialogueTextLayer, "clear", lambda self: clears.append(1) or original_clear(self))
+
+    layer = make_layer()
+    total_chars = sum(len(text) for _, text, _ in CHUNKS)
+    for chars_visible in range(total_chars + 1):
+        layer.update(get_typed_runs(chars_visible))
+
+    # Only the clear made by the constructor
+    assert len(clears) == 1
+
+def test_typed_layer_matches_one_drawn_at_once():
+    layer = make_layer()
+    total_chars = sum(len(text) for _, text, _ in CHUNKS)
+    for chars_visible in range(total_chars + 1):
+        layer.update(get_typed_runs(chars_visible))
+        fresh = make_layer()
+        fresh.update(get_typed_runs(chars_visible))
+        assert_same_image(draw_layer(layer), draw_layer(fresh))
+        assert_same_image(draw_layer(layer), draw_runs_directly(get_typed_runs(chars_visible)))
+
+def test_new_page_rebuilds_the_layer():
+    layer = make_layer()
+    layer.update(get_typed_runs(20))
+    layer.update(((0, "Objection!", WHITE),))
+    assert layer.drawn_runs == [(0, "Objection!", WHITE)]
+
+def test_runs_sharing_pixels_keep_their_own_colours():
+    # "/" and "x" reach back over the end of the run before them, so the
+    # runs' glyph boxes overlap each other's ink
+    runs = ((0, "Exhibit 9", WHITE), (0, "/10", RED), (0, "x", BLUE))
+    layer = make_layer()
+    for chars_visible in range(1, 14):
+        typed = []
+        for line_no, text, fill in runs:
+            typed.append((line_no, text[:max(min(chars_visible, len(text)), 0)], fill))
+            chars_visible -= len(text)
+        layer.update(tuple(typed))
+        assert_same_image(draw_layer(layer), draw_runs_directly(tuple(typed)))
+
+def test_right_to_left_runs_only_erase_themselves():
+    runs = ((0, "Room 9", WHITE), (0, "/10", RED), (0, "x3", BLUE), (1, "Hm", WHITE), (1, "0/0", RED))
+    layer = make_layer(use_rtl=True)
+    total_chars = sum(len(text) for _, text, _ in runs)
+    for chars_visible in range(total_chars + 1):
+        typed = []
+        remaining = chars_visible
+        for line_no, text, fill in runs:
+            typed.append((line_no, text[:max(min(remaining, len(text)), 0)], fill))
+            remaining -= len(text)
+        layer.update(tuple(typed))
+        shown = tuple(run for run in typed if run[1] != "")
+        assert_same_image(draw_layer(layer), draw_runs_directly(shown, use_rtl=True))
+
+def test_array_drawing_matches_pillow_drawing():
+    layer = make_layer()
+    layer.update(((0, "Exhibit 9", WHITE), (0, "/10", RED), (1, "autopsy", BLUE)))
+    buffer = np.array(make_background())
+    layer.draw_array(buffer)
+    assert np.array_equal(buffer, np.asarray(draw_layer(layer)))
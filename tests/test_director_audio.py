@@ -0,0 +1,70 @@
+import wave
+import numpy as np
+from pytest import approx
+import MovieKit
+from MovieKit import Director, MIX_CHANNELS, ms_to_audio_frames
+from tag_macros import SLAM_PHX, OBJ_EDW, END_BOX
+
+BOX = f"{SLAM_PHX}{OBJ_EDW}<music start trial/>Hold it!{END_BOX}"
+
+def test_playing_the_timeline_only_queues_its_audio_cues(make_director):
+    director = make_director(BOX)
+    director.advance(director.timeline.total_frames)
+    assert director.is_done
+    assert director.audio_commands == director.timeline.audio_commands
+
+def test_play_methods_queue_audio_at_the_current_time(make_director):
+    director = make_director(BOX)
+    director.advance(10)
+    queued = len(director.audio_commands)
+    time = director.time
+
+    director.play_phoenix_desk_slam()
+    director.exclamation.play_objection("edgeworth")
+    director.start_voice_blips("male")
+    director.start_music_track("trial")
+    director.advance(5)
+    director.end_voice_blips()
+
+    new_cues = director.audio_commands[queued:]
+    assert [cue["path"] for cue in new_cues] == [
+        "new_assets/sound/sfx-deskslam.wav",
+        "new_assets/exclamations/objection-generic.wav",
+        "new_assets/sound/sfx-blipmale.wav",
+        "new_assets/music/trial.mp3",
+    ]
+    assert new_cues[0]["offset"] == time + 0.15
+    assert new_cues[2]["end"] == director.time
+    assert director.phoenix.filepath == "new_assets/character_sprites/phoenix/phoenix-deskslam.gif"
+
+    # Tracks started outside the timeline end with the movie
+    director.advance(director.timeline.total_frames)
+    assert new_cues[3]["end"] == approx((director.timeline.total_frames - 1) / director.fps)
+
+def test_looped_cues_repeat_until_their_end(tmp_path, monkeypatch):
+    # A 100 ms ramp stands in for a decoded sound
+    samples = np.arange(ms_to_audio_frames(100) * MIX_CHANNELS, dtype=np.int16).reshape(-1, MIX_CHANNELS) % 1000
+    monkeypatch.setattr(MovieKit, "decode_audio", lambda path: samples)
+    director = Director()
+    director.audio_commands = [
+        {"path": "complete", "offset": 0.0, "loop_type": "loop_complete_only", "end": 0.25},
+        {"path": "truncated", "offset": 0.5, "loop_type": "loop_until_truncated", "end": 0.75},
+        {"path": "past the end", "offset": 0.95, "loop_type": "loop_until_truncated"},
+    ]
+    with wave.open(director.render_audio(1.0, str(tmp_path / "mix")), "rb") as f:
+        mixed = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16).reshape(-1, MIX_CHANNELS)
+
+    expected = np.zeros((ms_to_audio_frames(1000), MIX_CHANNELS), dtype=np.int16)
+    # Three whole repetitions cover the first 250 ms
+    expected[:3 * len(samples)] = np.tile(samples, (3, 1))
+    expected[ms_to_audio_frames(500):ms_to_audio_frames(750)] = np.tile(samples, (3, 1))[:ms_to_audio_frames(250)]
+    expected[ms_to_audio_frames(950):] = samples[:ms_to_audio_frames(50)]
+    assert np.array_equal(mixed, expected)
+
+def test_loop_delays_pad_the_decoded_samples(monkeypatch):
+    samples = np.ones((ms_to_audio_frames(100), MIX_CHANNELS), dtype=np.int16)
+    monkeypatch.setattr(MovieKit, "decode_audio", lambda path: samples)
+    padded = MovieKit.load_audio_samples("blip.wav", 50)
+    assert len(padded) == ms_to_audio_frames(150)
+    assert not padded[len(samples):].any()
+    assert MovieKit.load_audio_samples("blip.wav") is samples
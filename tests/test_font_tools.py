@@ -0,0 +1,38 @@
+from random import Random
+from PIL import ImageFont
+from font_tools import fit_words_within_width
+
+def fit_words_by_remeasuring(words, font: ImageFont.FreeTypeFont, insert_space: bool) -> str:
+    """
+    Wraps words the way `fit_words_within_width` did before it kept track of
+    the current line, measuring the whole last line after every word.
+    """
+    new_text = ""
+    space = " " if insert_space else ""
+    for word in words:
+        last_sentence = new_text.split("\n")[-1] + word + space
+        if font.getlength(text=last_sentence) >= 240:
+            if new_text.split("\n")[-1] != "":
+                new_text += "\n"
+            new_text += fit_words_by_remeasuring(word, font, False) + space
+        else:
+            new_text += word + space
+    return new_text
+
+def make_word(rng: Random) -> str:
+    length = rng.choice([1, 2, 3, 5, 8, 13, 40])
+    word = "".join(rng.choice("aeiouWMfijlrtAV.,!?'") for _ in range(length))
+    # Newlines inside long words get their own line breaks
+    if rng.random() < 0.05:
+        position = rng.randrange(len(word) + 1)
+        word = word[:position] + "\n" + word[position:]
+    return word
+
+def test_wrapping_matches_remeasuring_every_line():
+    rng = Random(0)
+    for size in [8, 12, 16, 24]:
+        font = ImageFont.load_default(size)
+        for _ in range(25):
+            words = [make_word(rng) for _ in range(rng.randrange(1, 30))]
+            for insert_space in [True, False]:
+                assert fit_words_within_width(words, font, insert_space) == fit_words_by_remeasuring(words, font, insert_space), (size, words, insert_space)
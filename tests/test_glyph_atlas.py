@@ -0,0 +1,37 @@
+from random import Random
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+from glyph_atlas import GlyphAtlas
+
+TEXTS = [
+    "Hold it! That's not what the autopsy says.",
+    "AVATAR Type WAVE To. Yes, fly",
+    "Mr. Edgeworth",
+]
+
+def test_atlas_text_matches_pillow_text():
+    rng = Random(0)
+    for size in [8, 16]:
+        font = ImageFont.load_default(size)
+        for text in TEXTS:
+            # Fractional positions, including halves, round like Pillow's
+            positions = [(10, 4), (10.5, 4.5), (3.25, 7.75)] + [(rng.uniform(0, 20), rng.uniform(0, 10)) for _ in range(20)]
+            for xy in positions:
+                expected = Image.new("L", (400, 40))
+                ImageDraw.ImageDraw(expected).text(xy, text, font=font, fill=255)
+                atlas_img = Image.new("L", (400, 40))
+                atlas = GlyphAtlas()
+                atlas.draw_text(atlas_img, xy, text, font, 255)
+                assert ImageChops.difference(expected, atlas_img).getbbox() is None, (size, text, xy)
+                assert atlas.get_length(text, font) == font.getlength(text)
+
+def test_overlapping_glyphs_match_pillow_text():
+    # These glyphs share pixels with their neighbours, where Pillow lays
+    # each glyph's coverage over the last before blending the colour once
+    for size, text in [(8, "wo"), (8, "Edgeworth"), (16, "rv")]:
+        font = ImageFont.load_default(size)
+        for xy in [(5 + i / 8, 4 + i / 16) for i in range(8)]:
+            expected = Image.new("RGBA", (200, 40), (20, 40, 60, 255))
+            ImageDraw.ImageDraw(expected).text(xy, text, font=font, fill=(240, 112, 56))
+            atlas_img = Image.new("RGBA", (200, 40), (20, 40, 60, 255))
+            GlyphAtlas().draw_text(atlas_img, xy, text, font, (240, 112, 56))
+            assert expected.tobytes() == atlas_img.tobytes(), (size, text, xy)
@@ -0,0 +1,101 @@
+from random import Random
+import pytest
+from font_constants import FONT_ARRAY
+from font_tools import get_best_font, split_str_into_newlines, split_with_joined_sentences
+from parse_tags import (
+    DialogueAction,
+    DialoguePage,
+    DialogueTag,
+    DialogueTextChunk,
+    DialogueTextContent,
+    DialogueTextLineBreak,
+    get_rich_boxes,
+    parse_text,
+    tag_re,
+)
+from timeline import compile_timeline
+
+def test_malformed_action_fails_when_it_is_run(ace_attorney_assets):
+    pages = get_rich_boxes('<nametag "Phoenix/>Hold it!', use_spacy=False)
+    action = pages[0].commands[0]
+    assert isinstance(action, DialogueAction)
+    with pytest.raises(ValueError):
+        compile_timeline(pages)
+
+def test_action_args_are_split_once():
+    action = DialogueAction('nametag "Miles Edgeworth"', 0)
+    assert action.args == ["nametag", "Miles Edgeworth"]
+    assert action.args is action.args
+
+def parse_by_searching_again(text: str) -> tuple[str, list[DialogueTag], list[tuple[str, int]]]:
+    """
+    Parses tags the way `parse_text` did before its single pass, cutting
+    each tag out and searching the rest of the text again from the start.
+    """
+    tag_stack = []
+    tags = []
+    actions = []
+    next_match = tag_re.search(text)
+    while next_match is not None:
+        start, end = next_match.span(0)
+        text = text[:start] + text[end:]
+        closing_slash, tag_name, self_closing_slash = next_match.group(1, 2, 3)
+        if closing_slash != "/" and self_closing_slash != "/":
+            tag_stack.append((tag_name, start))
+        elif closing_slash == "/":
+            name, tag_start = tag_stack.pop()
+            tags.append(DialogueTag(name, tag_start, start))
+        else:
+            actions.append((tag_name, start))
+        next_match = tag_re.search(text)
+    return text, tags, actions
+
+def make_script(rng: Random) -> str:
+    pieces = []
+    open_tags = []
+    for _ in range(rng.randrange(1, 40)):
+        match rng.randrange(4):
+            case 0:
+                open_tags.append(rng.choice(["red", "blue", "green"]))
+                pieces.append(f"<{open_tags[-1]}>")
+            case 1 if len(open_tags) > 0:
+                pieces.append(f"</{open_tags.pop()}>")
+            case 2:
+                pieces.append(rng.choice(['<shake 3 0.3/>', '<nametag "Miles Edgeworth"/>', '<flash 0.15/>', '<showbox/>']))
+            case _:
+                pieces.append(rng.choice(["Hold it!", " ", "Objection", "a", "...", ""]))
+    pieces.extend(f"</{name}>" for name in reversed(open_tags))
+    return "".join(pieces)
+
+def test_single_pass_parse_matches_searching_again():
+    rng = Random(0)
+    for _ in range(300):
+        script = make_script(rng)
+        content = parse_text(script)
+        assert (content.cleaned_lines, content.tags, [(action.name, action.index) for action in content.actions]) == parse_by_searching_again(script), script
+
+def get_chunks_per_character(content: DialogueTextContent) -> list[DialoguePage]:
+    """
+    Builds pages the way `get_text_chunks` did before it gathered runs, with
+    a chunk per character merged afterwards by `condense_chunks`.
+    """
+    pages = []
+    current_position = 0
+    for box_text in split_with_joined_sentences(content.cleaned_lines, False):
+        font_path = get_best_font(box_text, FONT_ARRAY)["path"]
+        chunks = []
+        for line in split_str_into_newlines(box_text, font_path, 15).split("\n"):
+            for char in line:
+                chunks.extend(action for action in content.actions if action.index == current_position)
+                chunks.append(DialogueTextChunk(char, [tag.name for tag in content.tags if current_position in tag.range()]))
+                current_position += 1
+            chunks.append(DialogueTextLineBreak())
+        pages.append(DialoguePage(chunks).condense_chunks())
+    return pages
+
+def test_chunks_match_condensing_a_chunk_per_character(ace_attorney_assets):
+    rng = Random(1)
+    for _ in range(100):
+        content = parse_text(make_script(rng))
+        assert [page.get_content_data() for page in content.get_text_chunks(use_spacy=False)] == \
+            [page.get_content_data() for page in get_chunks_per_character(content)]
@@ -0,0 +1,25 @@
+import json
+from os.path import exists
+import pytest
+import render_shards
+from render_shards import MANIFEST_VERSION, claim_shard, get_shard_name, run_worker
+
+def test_failed_shard_can_be_claimed_again(tmp_path, monkeypatch):
+    with open(tmp_path / "manifest.json", "w") as f:
+        json.dump({"version": MANIFEST_VERSION, "assets": {}, "shards": [{"index": 0}]}, f)
+
+    def fail(directory, manifest, index, workers):
+        open(tmp_path / f"partial-{get_shard_name(index)}", "w").close()
+        raise RuntimeError("ffmpeg failed")
+    monkeypatch.setattr(render_shards, "render_shard", fail)
+
+    with pytest.raises(RuntimeError):
+        run_worker(str(tmp_path))
+    assert not exists(tmp_path / f"partial-{get_shard_name(0)}")
+    assert claim_shard(str(tmp_path), 0)
+
+def test_shards_split_frames_evenly():
+    segments = [(0, 10), (10, 20), (20, 60), (60, 70), (70, 80), (80, 90), (90, 100)]
+    assert render_shards.plan_shards(segments, 3) == [(0, 60), (60, 80), (80, 100)]
+    assert render_shards.plan_shards(segments, 1) == [(0, 100)]
+    assert render_shards.plan_shards([], 3) == []
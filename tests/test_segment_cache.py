@@ -0,0 +1,77 @@
+from ace_attorney_scene import AceAttorneyDirector
+from tag_macros import (
+    SPR_PHX_NORMAL_T,
+    SPR_PHX_NORMAL_I,
+    SPR_EDW_NORMAL_T,
+    SPR_EDW_NORMAL_I,
+    SLAM_PHX,
+    OBJ_EDW,
+    END_BOX,
+    S_DRAMAPOUND,
+)
+
+BOXES = [
+    f'<nametag "Phoenix"/><showbox/>{SPR_PHX_NORMAL_T}The witness is lying!{SPR_PHX_NORMAL_I}{S_DRAMAPOUND}{END_BOX}',
+    f'{OBJ_EDW}<nametag "Edgeworth"/>{SPR_EDW_NORMAL_T}Baseless conjecture.{SPR_EDW_NORMAL_I}{END_BOX}',
+    f'<nametag "Phoenix"/>{SLAM_PHX}{SPR_PHX_NORMAL_T}Then explain <red>this</red>!{SPR_PHX_NORMAL_I}{S_DRAMAPOUND}{END_BOX}',
+    f'<nametag "Edgeworth"/>{SPR_EDW_NORMAL_T}I... see.{SPR_EDW_NORMAL_I}<pan left/>{END_BOX}',
+]
+
+def get_segment_keys(director: AceAttorneyDirector) -> list[str]:
+    """
+    Segment keys in the order `render_movie_segmented` looks them up.
+    """
+    keys = []
+    for start, end in director.get_segments():
+        keys.append(director.get_segment_key(start, end, {}))
+        director.advance(end - start)
+    return keys
+
+def test_editing_a_page_keeps_later_segments_cached(make_director):
+    keys = get_segment_keys(make_director(*BOXES))
+    # Makes the first page longer, shifting every later page in time
+    edited = [BOXES[0].replace("is lying", "is obviously lying")] + BOXES[1:]
+    edited_keys = get_segment_keys(make_director(*edited))
+
+    assert len(keys) == len(BOXES) == len(edited_keys)
+    assert edited_keys[0] != keys[0]
+    assert edited_keys[1:] == keys[1:]
+
+def test_later_segments_keep_their_shake_after_an_edit(make_director):
+    # The shaker's random offsets on a later page don't depend on how many
+    # frames earlier pages shook for
+    def get_shake_offsets(director: AceAttorneyDirector) -> list[tuple[int, int]]:
+        start, end = director.get_segments()[2]
+        director.advance(start)
+        offsets = []
+        for _ in range(end - start):
+            director.advance(1)
+            offsets.append((director.bg_shaker.x, director.bg_shaker.y))
+        return offsets
+
+    offsets = get_shake_offsets(make_director(*BOXES))
+    assert any(offset != (0, 0) for offset in offsets)
+    edited = [BOXES[0].replace("<shake 3 0.3/>", "<shake 3 0.6/>")] + BOXES[1:]
+    assert get_shake_offsets(make_director(*edited)) == offsets
+
+def test_inserting_a_page_keeps_cached_segments_correct(make_director):
+    # A cached segment is only reused if its frames are what a fresh render
+    # of the edited script would give
+    def get_segment_frames(director: AceAttorneyDirector) -> dict[str, list[bytes]]:
+        frames = {}
+        for start, end in director.get_segments():
+            key = director.get_segment_key(start, end, {})
+            frames[key] = [img.tobytes() for img in director.render_frames(frame_count=end - start)]
+        return frames
+
+    frames = get_segment_frames(make_director(*BOXES))
+    # Leaves the scene as the page before it did, so the pages after it can
+    # still be reused
+    edited = BOXES[:2] + [f'<nametag "Edgeworth"/>{SPR_EDW_NORMAL_T}Hmm.{SPR_EDW_NORMAL_I}{END_BOX}'] + BOXES[2:]
+    edited_frames = get_segment_frames(make_director(*edited))
+
+    reused = [key for key in edited_frames if key in frames]
+    # Every original page, including the shaking ones after the new page
+    assert len(reused) == len(BOXES)
+    for key in reused:
+        assert edited_frames[key] == frames[key]
@@ -0,0 +1,26 @@
+from subprocess import Popen, PIPE
+from sys import executable
+import pytest
+from ace_attorney_scene import AceAttorneyDirector
+from tag_macros import END_BOX
+
+BOX = f"Hold it!{END_BOX}"
+
+def use_encoder(director: AceAttorneyDirector, encoder_code: str) -> AceAttorneyDirector:
+    # Stands in for ffmpeg, reading raw frames from stdin
+    director.start_video_stream = lambda output_location: Popen([executable, "-c", encoder_code], stdin=PIPE, stderr=PIPE)
+    return director
+
+def test_encoder_failing_at_the_end_raises_with_its_output(make_director):
+    director = use_encoder(make_director(BOX), "import sys; sys.stdin.buffer.read(); sys.stderr.write('Conversion failed!'); sys.exit(1)")
+    with pytest.raises(Exception, match="Conversion failed!"):
+        director.write_video_stream("video.mp4")
+
+def test_encoder_exiting_early_raises_with_its_output(make_director):
+    director = use_encoder(make_director(BOX), "import sys; sys.stderr.write('Invalid argument'); sys.exit(1)")
+    with pytest.raises(Exception, match="Invalid argument"):
+        director.write_video_stream("video.mp4")
+
+def test_encoder_succeeding_returns_the_frame_count(make_director):
+    director = use_encoder(make_director(BOX), "import sys; sys.stdin.buffer.read()")
+    assert director.write_video_stream("video.mp4") == director.timeline.total_frames
@@ -0,0 +1,295 @@
+from dataclasses import dataclass, field
+from bisect import bisect_right
+from os.path import exists
+from parse_tags import DialoguePage, DialogueTextChunk, DialogueAction, DialogueTextLineBreak
+
+@dataclass
+class TimelineEvent:
+    frame: int
+    page_index: int
+
+@dataclass
+class PageStartEvent(TimelineEvent):
+    ...
+
+@dataclass
+class CharRevealEvent(TimelineEvent):
+    chunk: DialogueTextChunk = None
+    position: int = 0
+
+@dataclass
+class ItemCompleteEvent(TimelineEvent):
+    item: object = None
+
+@dataclass
+class SpriteEvent(TimelineEvent):
+    position: str = ""
+    path: str = ""
+
+@dataclass
+class DeskSlamEvent(TimelineEvent):
+    character: str = ""
+
+@dataclass
+class BubbleEvent(TimelineEvent):
+    exclamation_type: str = ""
+    character: str = ""
+
+@dataclass
+class ShakeEvent(TimelineEvent):
+    magnitude: float = 0.0
+    duration: float = 0.0
+
+@dataclass
+class FlashEvent(TimelineEvent):
+    duration: float = 0.0
+
+@dataclass
+class ArrowEvent(TimelineEvent):
+    visible: bool = False
+
+@dataclass
+class BoxEvent(TimelineEvent):
+    visible: bool = False
+
+@dataclass
+class NametagEvent(TimelineEvent):
+    name: str = ""
+
+@dataclass
+class CameraEvent(TimelineEvent):
+    position: str = ""
+    pan: bool = False
+
+@dataclass
+class AudioCueEvent(TimelineEvent):
+    command: dict = field(default_factory=dict)
+
+@dataclass
+class EndEvent(TimelineEvent):
+    ...
+
+def get_exclamation_sound_path(type: str, speaker: str):
+    base_name = f"new_assets/exclamations/{type}-{speaker}"
+    if exists(f"{base_name}.mp3"):
+        return f"{base_name}.mp3"
+    elif exists(f"{base_name}.wav"):
+        return f"{base_name}.wav"
+    return f"new_assets/exclamations/objection-generic.wav"
+
+DESK_SLAM_SOUND_DELAY = {
+    "phoenix": 0.15,
+    "edgeworth": 0.25,
+}
+
+class Timeline:
+    """
+    Every event that happens while playing a list of `DialoguePage`s, indexed
+    by the frame it happens on. Built by `compile_timeline`.
+    """
+    def __init__(self, fps: float):
+        self.fps = fps
+        self.events: dict[int, list[TimelineEvent]] = {}
+        self.page_start_frames: list[int] = []
+        self.audio_commands: list[dict] = []
+        self.total_frames: int = 0
+
+    def add_event(self, event: TimelineEvent):
+        self.events.setdefault(event.frame, []).append(event)
+
+    def get_events(self, frame: int) -> list[TimelineEvent]:
+        return self.events.get(frame, [])
+
+    def get_page_index(self, frame: int) -> int:
+        return max(bisect_right(self.page_start_frames, frame) - 1, 0)
+
+    def get_duration(self) -> float:
+        return self.total_frames * (1 / self.fps)
+
+    def get_event_data(self, start: int, end: int) -> list:
+        """
+        JSON-serializable description of the events between frames `start`
+        and `end`, with frames relative to `start`. Audio cues are left out
+        since they don't affect the picture.
+        """
+        data = []
+        for frame in range(start, end):
+            for event in self.events.get(frame, []):
+                if isinstance(event, AudioCueEvent):
+                    continue
+                fields = {name: get_event_field_data(value) for name, value in vars(event).items()}
+                fields["frame"] -= start
+                del fields["page_index"]
+                data.append([type(event).__name__, fields])
+        return data
+
+def get_event_field_data(value):
+    if isinstance(value, DialogueTextChunk):
+        return [value.text, value.tags]
+    elif isinstance(value, DialogueAction):
+        return value.args
+    elif isinstance(value, DialogueTextLineBreak):
+        return "linebreak"
+    return value
+
+def compile_timeline(pages: list[DialoguePage], fps: float = 30, max_time_for_char: float = 0.03) -> Timeline:
+    """
+    Walks `pages` with the same timing rules the director uses when stepping
+    `update(1 / fps)` frame by frame, and records what happens on each frame.
+    Audio cues are resolved here too, so the full audio track is known before
+    any video frame is rendered.
+    """
+    timeline = Timeline(fps)
+    delta = 1 / fps
+    frame = 0
+    time = 0.0
+    cur_time_for_char = 0.0
+    current_music_track: dict = None
+    current_voice_blips: dict = None
+
+    def step():
+        nonlocal frame, time
+        frame += 1
+        time += delta
+
+    def add_audio(page_index: int, command: dict):
+        timeline.audio_commands.append(command)
+        timeline.add_event(AudioCueEvent(frame, page_index, command))
+
+    def end_music_track():
+        nonlocal current_music_track
+        if current_music_track is not None:
+            current_music_track["end"] = time
+            current_music_track = None
+
+    def end_voice_blips():
+        nonlocal current_voice_blips
+        if current_voice_blips is not None:
+            current_voice_blips["end"] = time
+            current_voice_blips = None
+
+    for page_index, page in enumerate(pages):
+        timeline.page_start_frames.append(frame)
+        timeline.add_event(PageStartEvent(frame, page_index))
+
+        for item in page.commands:
+            if isinstance(item, DialogueTextChunk):
+                position = 0
+                while True:
+                    cur_time_for_char += delta
+                    if cur_time_for_char >= max_time_for_char:
+                        position += 1
+                        cur_time_for_char = 0
+                        timeline.add_event(CharRevealEvent(frame, page_index, item, position))
+                        if position >= len(item.text):
+                            timeline.add_event(ItemCompleteEvent(frame, page_index, item))
+                            step()
+                            break
+                    step()
+
+            elif isinstance(item, DialogueAction):
+                match item.args:
+                    case ["wait", duration_str]:
+                        while True:
+                            cur_time_for_char += delta
+                            if cur_time_for_char >= float(duration_str):
+                                cur_time_for_char = 0.0
+                                break
+                            step()
+
+                    case ["startblip", voice_type]:
+                        end_voice_blips()
+                        current_voice_blips = {
+                            "type": "audio",
+                            "path": f"new_assets/sound/sfx-blip{voice_type}.wav",
+                            "offset": time,
+                            "loop_delay": 0.06,
+                            "loop_type": "loop_complete_only",
+                        }
+                        add_audio(page_index, current_voice_blips)
+
+                    case ["stopblip"]:
+                        end_voice_blips()
+
+                    case ["sprite", position, path]:
+                        timeline.add_event(SpriteEvent(frame, page_index, position, path))
+
+                    case ["bubble", exclamation_type, character]:
+                        timeline.add_event(BubbleEvent(frame, page_index, exclamation_type, character))
+                        add_audio(page_index, {
+                            "type": "audio",
+                            "path": get_exclamation_sound_path(exclamation_type, character),
+                            "offset": time
+                        })
+
+                    case ["deskslam", character]:
+                        timeline.add_event(DeskSlamEvent(frame, page_index, character))
+                        if character in DESK_SLAM_SOUND_DELAY:
+                            add_audio(page_index, {
+                                "type": "audio",
+                                "path": "new_assets/sound/sfx-deskslam.wav",
+                                "offset": time + DESK_SLAM_SOUND_DELAY[character]
+                            })
+
+                    case ["showarrow"]:
+                        timeline.add_event(ArrowEvent(frame, page_index, True))
+
+                    case ["hidearrow"]:
+                        timeline.add_event(ArrowEvent(frame, page_index, False))
+
+                    case ["showbox"]:
+                        timeline.add_event(BoxEvent(frame, page_index, True))
+
+                    case ["hidebox"]:
+                        timeline.add_event(BoxEvent(frame, page_index, False))
+
+                    case ["nametag", name]:
+                        timeline.add_event(NametagEvent(frame, page_index, name))
+
+                    case ["sound", sound_path]:
+                        add_audio(page_index, {
+                            "type": "audio",
+                            "path": f"new_assets/sound/sfx-{sound_path}.wav",
+                            "offset": time
+                        })
+
+                    case ["shake", magnitude_str, duration_str]:
+                        timeline.add_event(ShakeEvent(frame, page_index, float(magnitude_str), float(duration_str)))
+
+                    case ["flash", duration_str]:
+                        timeline.add_event(FlashEvent(frame, page_index, float(duration_str)))
+
+                    case ["music", "start", music_name]:
+                        end_music_track()
+                        current_music_track = {
+                            "type": "audio",
+                            "path": f"new_assets/music/{music_name}.mp3",
+                            "offset": time,
+                            "loop_type": "loop_until_truncated"
+                        }
+                        add_audio(page_index, current_music_track)
+
+                    case ["music", "stop"]:
+                        end_music_track()
+
+                    case ["cut", position]:
+                        timeline.add_event(CameraEvent(frame, page_index, position, False))
+
+                    case ["pan", position]:
+                        timeline.add_event(CameraEvent(frame, page_index, position, True))
+
+                timeline.add_event(ItemCompleteEvent(frame, page_index, item))
+                step()
+
+            elif isinstance(item, DialogueTextLineBreak):
+                timeline.add_event(ItemCompleteEvent(frame, page_index, item))
+                step()
+
+        # The director spends one frame noticing the page is finished
+        step()
+
+    end_music_track()
+    end_voice_blips()
+    timeline.add_event(EndEvent(frame, len(pages)))
+    timeline.total_frames = frame + 1
+    return timeline